@@ -1,17 +1,213 @@
+import os
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
 import pandas as pd
-from sklearn.cluster import KMeans
+from scipy.optimize import linear_sum_assignment
+from sklearn.cluster import MiniBatchKMeans
 from sklearn.preprocessing import StandardScaler
 
-df = pd.read_csv("data/featured_business.csv")
+from etl.artifacts import artifact_path, read_artifact, read_table, write_artifact
+from etl.profiling import profile, profile_run
+
+FEATURES = ["stars", "review_count"]
+# Número de clusters (ver analysis/model_selection.py para elegirlo)
+N_CLUSTERS = int(os.environ.get("N_CLUSTERS", 4))
+CHUNK_ROWS = 100_000
+EPOCHS = 5
+RANDOM_STATE = 42
+
+MODEL_PATH = "data/models/clustering.joblib"
+
+# Prototipos de los cuadrantes (reseñas, valoración) en unidades relativas a
+# los centroides, con su etiqueta y colores. Con más clusters que cuadrantes
+# los prototipos se repiten por niveles: el segundo nivel lleva " (2)" y el
+# segundo color, y así sucesivamente.
+QUADRANTS = [
+    ((-1, 1), "Pocas reseñas, alta valoración", ["#FFEB3B", "#F9A825", "#FFF59D"]),
+    ((-1, -1), "Pocas reseñas, baja valoración", ["#E53935", "#B71C1C", "#EF9A9A"]),
+    ((1, -1), "Muchas reseñas, baja valoración", ["#1E88E5", "#0D47A1", "#90CAF9"]),
+    ((1, 1), "Muchas reseñas, alta valoración", ["#4CAF50", "#1B5E20", "#A5D6A7"]),
+]
+OTHER_LABEL = "Otros"
+OTHER_COLOR = "#9E9E9E"
+
+# Desplazamiento máximo de la media de un cluster respecto a la del
+# entrenamiento (en unidades estandarizadas) antes de reentrenar
+DRIFT_THRESHOLD = 0.25
+
+def iter_chunks(name, columns, chunk_rows=CHUNK_ROWS):
+    """
+    Recorre un artefacto por trozos de filas; el fichero está mapeado en
+    memoria, así que solo se materializa un trozo a la vez.
+    """
+    for batch in read_table(name, columns).to_batches(max_chunksize=chunk_rows):
+        yield batch.to_pandas().to_numpy(dtype="float64")
+
+def cluster_labels(kmeans):
+    """
+    Nombra cada cluster emparejando su centroide con un prototipo de
+    cuadrante (asignación húngara, uno a uno): nunca hay dos clusters con la
+    misma etiqueta, sea cual sea la posición de los centroides o N_CLUSTERS.
+    Los centroides se expresan respecto a su media y dispersión en cada eje.
+    Devuelve las etiquetas {cluster: etiqueta} y los colores {etiqueta: color}.
+    """
+    centers = kmeans.cluster_centers_[:, [FEATURES.index("review_count"), FEATURES.index("stars")]]
+    spread = centers.std(axis=0)
+    relative = (centers - centers.mean(axis=0)) / np.where(spread > 0, spread, 1)
+
+    levels = -(-len(centers) // len(QUADRANTS))
+    slots = [(level, quadrant) for level in range(levels) for quadrant in QUADRANTS]
+    prototypes = np.array([quadrant[0] for _, quadrant in slots], dtype="float64")
+    # Los niveles superiores cuestan un poco más: se ocupan solo si hace falta
+    cost = ((relative[:, None, :] - prototypes[None, :, :]) ** 2).sum(axis=2)
+    cost += np.array([level for level, _ in slots]) * 100
+    clusters, chosen = linear_sum_assignment(cost)
+
+    labels, colors = {}, {}
+    for cluster, slot in zip(clusters, chosen):
+        level, (_, name, palette) = slots[slot]
+        label = name if level == 0 else f"{name} ({level + 1})"
+        labels[int(cluster)] = label
+        colors[label] = palette[level] if level < len(palette) else OTHER_COLOR
+    return labels, colors
+
+def cluster_palette(model):
+    """
+    Colores de la leyenda en el orden de los clusters, más la etiqueta de los
+    negocios sin cluster asignado.
+    """
+    palette = {model["labels"][cluster]: model["colors"][model["labels"][cluster]] for cluster in sorted(model["labels"])}
+    palette[OTHER_LABEL] = OTHER_COLOR
+    return palette
+
+def train(name="featured_business", n_clusters=N_CLUSTERS, epochs=EPOCHS):
+    """
+    Entrena escalador y KMeans por mini-lotes sobre trozos del artefacto, con
+    memoria acotada: una pasada para el escalador y varias para los centroides.
+    """
+    scaler = StandardScaler()
+    for chunk in iter_chunks(name, FEATURES):
+        scaler.partial_fit(chunk)
+
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=RANDOM_STATE, n_init=3)
+    for _ in range(epochs):
+        for chunk in iter_chunks(name, FEATURES):
+            if len(chunk) >= n_clusters:
+                kmeans.partial_fit(scaler.transform(chunk))
+
+    labels, colors = cluster_labels(kmeans)
+    return {
+        "features": FEATURES,
+        "scaler": scaler,
+        "kmeans": kmeans,
+        "labels": labels,
+        "colors": colors,
+        # Referencia para medir el desplazamiento en ejecuciones posteriores
+        "point_means": cluster_means(scaler, kmeans, name),
+        "trained_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+def save_model(model):
+    os.makedirs(os.path.dirname(MODEL_PATH), exist_ok=True)
+    joblib.dump(model, MODEL_PATH)
+
+def load_model():
+    if not os.path.exists(MODEL_PATH):
+        return None
+    model = joblib.load(MODEL_PATH)
+    # Si cambian las features o el número de clusters hay que reentrenar
+    # (también los modelos antiguos, que no guardan los colores ni las medias)
+    if model.get("features") != FEATURES or model["kmeans"].n_clusters != N_CLUSTERS:
+        return None
+    if "colors" not in model or "point_means" not in model:
+        return None
+    return model
+
+def cluster_means(scaler, kmeans, name="featured_business"):
+    """
+    Media de los puntos asignados a cada cluster, en unidades estandarizadas
+    (NaN en los clusters sin puntos). Solo usa predicción, sin reentrenar.
+    """
+    sums = np.zeros_like(kmeans.cluster_centers_)
+    counts = np.zeros(kmeans.n_clusters)
+    for chunk in iter_chunks(name, FEATURES):
+        scaled = scaler.transform(chunk)
+        labels = kmeans.predict(scaled)
+        np.add.at(sums, labels, scaled)
+        counts += np.bincount(labels, minlength=kmeans.n_clusters)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / counts[:, None]
+
+def centroid_drift(model, name="featured_business"):
+    """
+    Mide cuánto se han movido los clusters con los datos actuales: media de
+    los puntos asignados a cada cluster frente a la guardada al entrenar.
+    Con los mismos datos es 0. Las medias de MiniBatchKMeans no coinciden
+    con sus centroides, así que la referencia no son los centroides. Un
+    cluster que gana o pierde todos sus puntos cuenta como desplazamiento
+    infinito.
+    """
+    means = cluster_means(model["scaler"], model["kmeans"], name)
+    baseline = model["point_means"]
+    if (np.isnan(means[:, 0]) != np.isnan(baseline[:, 0])).any():
+        return float("inf")
+    assigned = ~np.isnan(baseline[:, 0])
+    if not assigned.any():
+        return 0.0
+    return float(np.linalg.norm(means[assigned] - baseline[assigned], axis=1).max())
+
+def assign_clusters(df: pd.DataFrame, model, previous: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Asigna cluster y etiqueta. Los negocios sin cambios en sus features
+    conservan el cluster anterior; solo se predicen los nuevos o modificados.
+    """
+    clusters = np.full(len(df), -1, dtype="int64")
+    if previous is not None and "cluster" in previous.columns:
+        prev = previous.set_index("business_id")[FEATURES + ["cluster"]]
+        prev = prev[~prev.index.duplicated()].reindex(df["business_id"])
+        unchanged = (prev[FEATURES].to_numpy(dtype="float64") == df[FEATURES].to_numpy(dtype="float64")).all(axis=1)
+        clusters[unchanged] = prev["cluster"].to_numpy()[unchanged]
+
+    pending = clusters < 0
+    if pending.any():
+        X = df.loc[pending, FEATURES].to_numpy(dtype="float64")
+        clusters[pending] = model["kmeans"].predict(model["scaler"].transform(X))
+    print(f"   {int(pending.sum())} negocios asignados por predicción")
+
+    df["cluster"] = clusters
+    df["cluster_label"] = df["cluster"].map(model["labels"]).fillna(OTHER_LABEL)
+    return df
 
-X = df[["stars", "review_count"]]
+if __name__ == "__main__":
+    with profile_run("clustering"):
+        model = load_model()
+        previous = None
 
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
+        if model is None or os.environ.get("REFIT_CLUSTERS") == "1":
+            print("🔄 Entrenando el modelo de clustering")
+            with profile("train"):
+                model = train()
+                save_model(model)
+        else:
+            with profile("centroid_drift"):
+                drift = centroid_drift(model)
+            print(f"   Desplazamiento de los centroides: {drift:.3f}")
+            if drift > DRIFT_THRESHOLD:
+                print("🔄 Desplazamiento por encima del umbral, se reentrena el modelo")
+                with profile("train"):
+                    model = train()
+                    save_model(model)
+            elif os.path.exists(artifact_path("business_clustered")):
+                previous = read_artifact("business_clustered", ["business_id"] + FEATURES + ["cluster"])
 
-kmeans = KMeans(n_clusters=4, random_state=42)
-df["cluster"] = kmeans.fit_predict(X_scaled)
+        df = read_artifact("featured_business")
+        with profile("assign_clusters", rows_in=len(df)) as section:
+            df = assign_clusters(df, model, previous)
+            section["rows_out"] = len(df)
 
-df.to_csv("data/business_clustered.csv", index=False)
+        with profile("write_artifact", rows_in=len(df)):
+            write_artifact(df, "business_clustered")
 
-print("✅ Clustering completado")
+    print("✅ Clustering completado")
@@ -0,0 +1,92 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.metrics import davies_bouldin_score, silhouette_score
+from sklearn.preprocessing import StandardScaler
+
+from analysis.clustering import FEATURES
+from etl.artifacts import read_table
+
+K_RANGE = range(2, 11)
+SEEDS = [0, 1, 2]
+WORKERS = os.cpu_count() or 1
+
+# El silhouette es O(n²): se calcula sobre una muestra
+SILHOUETTE_SAMPLE = 20_000
+
+REPORT_PATH = "data/models/k_selection.json"
+
+_X = None
+
+def _init_worker(X):
+    # Los datos escalados se envían una vez a cada proceso
+    global _X
+    _X = X
+
+def _fit_and_score(k, seed):
+    kmeans = MiniBatchKMeans(n_clusters=k, random_state=seed, n_init=3)
+    labels = kmeans.fit_predict(_X)
+    return {
+        "k": k,
+        "seed": seed,
+        "inertia": float(kmeans.inertia_),
+        "silhouette": float(silhouette_score(
+            _X, labels, sample_size=min(SILHOUETTE_SAMPLE, len(_X)), random_state=seed
+        )),
+        "davies_bouldin": float(davies_bouldin_score(_X, labels)),
+    }
+
+def summarize(results):
+    """
+    Media de cada métrica por k y k recomendado: el de mayor silhouette medio,
+    desempatando por el menor Davies-Bouldin.
+    """
+    by_k = {}
+    for k in sorted({r["k"] for r in results}):
+        runs = [r for r in results if r["k"] == k]
+        by_k[k] = {
+            metric: float(np.mean([r[metric] for r in runs]))
+            for metric in ("inertia", "silhouette", "davies_bouldin")
+        }
+        by_k[k]["silhouette_std"] = float(np.std([r["silhouette"] for r in runs]))
+
+    recommended = max(by_k, key=lambda k: (by_k[k]["silhouette"], -by_k[k]["davies_bouldin"]))
+    return by_k, recommended
+
+def select_k(name="featured_business", k_range=K_RANGE, seeds=SEEDS, workers=WORKERS):
+    """
+    Ajusta KMeans para cada combinación de k y semilla en paralelo y las
+    puntúa con inercia, silhouette (sobre una muestra) y Davies-Bouldin.
+    """
+    X = read_table(name, FEATURES).to_pandas().to_numpy(dtype="float64")
+    X = StandardScaler().fit_transform(X)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(X,)) as pool:
+        futures = [pool.submit(_fit_and_score, k, seed) for k in k_range for seed in seeds]
+        results = [future.result() for future in futures]
+
+    by_k, recommended = summarize(results)
+    return {
+        "features": FEATURES,
+        "rows": len(X),
+        "runs": results,
+        "by_k": by_k,
+        "recommended_k": recommended,
+    }
+
+if __name__ == "__main__":
+    report = select_k()
+
+    os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+    with open(REPORT_PATH, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for k, metrics in report["by_k"].items():
+        print(
+            f"   k={k}: silhouette {metrics['silhouette']:.3f} ± {metrics['silhouette_std']:.3f}, "
+            f"Davies-Bouldin {metrics['davies_bouldin']:.3f}, inercia {metrics['inertia']:.0f}"
+        )
+    print(f"✅ k recomendado: {report['recommended_k']} (informe en {REPORT_PATH})")
@@ -0,0 +1,45 @@
+import json
+import os
+import time
+
+from streamlit.testing.v1 import AppTest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "dashboard", "app.py")
+RERUNS = 3
+DETAIL_PATH = "data/dashboard_bench.json"
+
+def bench_dashboard(reruns=RERUNS):
+    """
+    Mide la primera carga del dashboard (lee el artefacto y construye los
+    índices) y varios reruns con la caché ya caliente, como cuando un usuario
+    cambia un filtro.
+    """
+    start = time.perf_counter()
+    app = AppTest.from_file(APP_PATH, default_timeout=600).run()
+    cold = time.perf_counter() - start
+    if app.exception:
+        raise RuntimeError(app.exception[0].value)
+
+    warm = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        app.run()
+        warm.append(time.perf_counter() - start)
+
+    # Rerun con un estado seleccionado (consulta filtrada y mapa por celdas)
+    start = time.perf_counter()
+    app.selectbox[0].set_value(app.selectbox[0].options[1]).run()
+    filtered = time.perf_counter() - start
+
+    return {
+        "cold_s": round(cold, 3),
+        "rerun_s": [round(t, 3) for t in warm],
+        "filtered_rerun_s": round(filtered, 3),
+    }
+
+if __name__ == "__main__":
+    detail = bench_dashboard()
+    with open(DETAIL_PATH, "w", encoding="utf-8") as f:
+        json.dump(detail, f)
+    print(f"✅ Dashboard: carga {detail['cold_s']} s, reruns {detail['rerun_s']}, filtro {detail['filtered_rerun_s']} s")
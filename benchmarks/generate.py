@@ -0,0 +1,231 @@
+import base64
+import json
+import os
+import sys
+
+import numpy as np
+
+SEED = 42
+# Registros generados por bloque (acota la memoria con 10M de reviews)
+CHUNK_REVIEWS = 200000
+
+# Proporciones aproximadas del dump de Yelp
+REVIEWS_PER_BUSINESS = 45
+REVIEWS_PER_USER = 3.5
+
+# Áreas metropolitanas del dataset: (ciudad, estado, latitud, longitud, peso)
+CITIES = [
+    ("Philadelphia", "PA", 39.95, -75.16, 0.16),
+    ("Tucson", "AZ", 32.22, -110.97, 0.10),
+    ("Tampa", "FL", 27.95, -82.46, 0.10),
+    ("Indianapolis", "IN", 39.77, -86.16, 0.09),
+    ("Nashville", "TN", 36.16, -86.78, 0.08),
+    ("New Orleans", "LA", 29.95, -90.07, 0.07),
+    ("Reno", "NV", 39.53, -119.81, 0.06),
+    ("Edmonton", "AB", 53.55, -113.49, 0.06),
+    ("Saint Louis", "MO", 38.63, -90.20, 0.06),
+    ("Santa Barbara", "CA", 34.42, -119.70, 0.04),
+    ("Boise", "ID", 43.62, -116.20, 0.04),
+    ("Clearwater", "FL", 27.97, -82.80, 0.03),
+    ("Wilmington", "DE", 39.74, -75.55, 0.03),
+    ("Metairie", "LA", 29.98, -90.15, 0.03),
+    ("Sparks", "NV", 39.53, -119.75, 0.02),
+    ("Cherry Hill", "NJ", 39.93, -75.03, 0.02),
+]
+# Dispersión de los negocios alrededor del centro de su ciudad (grados)
+CITY_SPREAD = 0.08
+# Fracción de ciudades escritas con variantes (minúsculas, espacios) como en el dump
+CITY_NOISE = 0.02
+
+# Categorías y su peso relativo
+CATEGORIES = [
+    ("Restaurants", 30), ("Food", 15), ("Shopping", 10), ("Home Services", 7), ("Beauty & Spas", 7),
+    ("Nightlife", 6), ("Bars", 6), ("Health & Medical", 6), ("Local Services", 5), ("Automotive", 5),
+    ("Event Planning & Services", 4), ("American (Traditional)", 4), ("Sandwiches", 4), ("Pizza", 4),
+    ("Coffee & Tea", 4), ("Breakfast & Brunch", 4), ("Fast Food", 3), ("Mexican", 3), ("Italian", 3),
+    ("Burgers", 3), ("Seafood", 2), ("Chinese", 2), ("Hotels & Travel", 2), ("Fitness & Instruction", 2),
+    ("Bakeries", 2), ("Desserts", 2), ("Salad", 1), ("Cafes", 1), ("Sushi Bars", 1), ("Juice Bars & Smoothies", 1),
+]
+
+NAME_PREFIXES = ["The", "Golden", "Blue", "Little", "Urban", "Old Town", "Happy", "Royal", "Green", "Corner"]
+NAME_SUFFIXES = ["Kitchen", "Grill", "Cafe", "Market", "Studio", "Bar", "Bistro", "Shop", "House", "Garage"]
+WORDS = (
+    "great food service place staff friendly good time back really love nice order came "
+    "best menu delicious recommend experience little well price went wait"
+).split()
+
+START_DATE = np.datetime64("2005-01-01T00:00:00", "s")
+END_DATE = np.datetime64("2022-01-19T00:00:00", "s")
+
+def make_ids(rng, n):
+    # Identificadores de 22 caracteres como los del dump (17 bytes aleatorios por id)
+    raw = base64.urlsafe_b64encode(rng.bytes(17 * n)).decode("ascii")
+    return [raw[i:i + 22] for i in range(0, 22 * n, 22)]
+
+def format_dates(rng, n, recent=False):
+    """
+    Fechas "YYYY-MM-DD HH:MM:SS" entre START_DATE y END_DATE. Con recent=True
+    hay más fechas en los años recientes (crecimiento de la plataforma).
+    """
+    u = rng.random(n)
+    offsets = (END_DATE - START_DATE).astype("int64") * (np.sqrt(u) if recent else u)
+    dates = START_DATE + offsets.astype("int64").astype("timedelta64[s]")
+    return np.char.replace(np.datetime_as_string(dates, unit="s"), "T", " ").tolist()
+
+def sizes(n_reviews):
+    n_business = max(n_reviews // REVIEWS_PER_BUSINESS, 100)
+    n_users = max(int(n_reviews / REVIEWS_PER_USER), 100)
+    return n_business, n_users
+
+def business_records(rng, business_ids, review_counts, mean_stars):
+    """
+    Negocios agrupados alrededor de las ciudades, con 1-4 categorías
+    ponderadas y la valoración media redondeada a medias estrellas.
+    """
+    n_business = len(business_ids)
+    weights = np.array([city[4] for city in CITIES])
+    city_idx = rng.choice(len(CITIES), size=n_business, p=weights / weights.sum())
+    lat = np.array([CITIES[i][2] for i in city_idx]) + rng.normal(0, CITY_SPREAD, n_business)
+    lon = np.array([CITIES[i][3] for i in city_idx]) + rng.normal(0, CITY_SPREAD, n_business)
+
+    cat_names = [name for name, _ in CATEGORIES]
+    cat_weights = np.array([w for _, w in CATEGORIES], dtype="float64")
+    n_cats = rng.integers(1, 5, size=n_business)
+    noise = rng.random(n_business) < CITY_NOISE
+    is_open = rng.random(n_business) < 0.8
+
+    for i in range(n_business):
+        city, state = CITIES[city_idx[i]][:2]
+        if noise[i]:
+            city = f" {city.lower()} " if i % 2 else city.upper()
+        cats = rng.choice(len(cat_names), size=n_cats[i], replace=False, p=cat_weights / cat_weights.sum())
+        stars = float(np.round(mean_stars[i] * 2) / 2) if review_counts[i] else 3.0
+        yield {
+            "business_id": business_ids[i],
+            "name": f"{NAME_PREFIXES[i % len(NAME_PREFIXES)]} {NAME_SUFFIXES[(i // 7) % len(NAME_SUFFIXES)]} {i}",
+            "address": f"{100 + i % 9900} Main St",
+            "city": city,
+            "state": state,
+            "postal_code": f"{10000 + city_idx[i] * 100 + i % 100}",
+            "latitude": round(float(lat[i]), 6),
+            "longitude": round(float(lon[i]), 6),
+            "stars": max(1.0, min(5.0, stars)),
+            "review_count": int(review_counts[i]),
+            "is_open": int(is_open[i]),
+            "attributes": None,
+            "categories": ", ".join(cat_names[c] for c in cats),
+            "hours": None,
+        }
+
+def review_stars(rng, quality):
+    """
+    Estrellas sesgadas como en Yelp: en torno a la calidad del negocio, con
+    exceso de 5 y de 1 (reseñas de entusiastas y de quejas).
+    """
+    stars = np.clip(np.rint(rng.normal(quality, 1.0)), 1, 5)
+    extreme = rng.random(len(quality))
+    stars[extreme < 0.12] = 5
+    stars[(extreme >= 0.12) & (extreme < 0.18)] = 1
+    return stars
+
+def generate(n_reviews, out_dir, seed=SEED):
+    """
+    Genera business, review y user en JSON lines con la estructura del dump
+    de Yelp. El resultado solo depende de n_reviews y seed.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    n_business, n_users = sizes(n_reviews)
+
+    # Popularidad de cola pesada: pocos negocios concentran muchas reseñas
+    popularity = rng.lognormal(0, 1.4, n_business)
+    quality = np.clip(5 * rng.beta(5, 2, n_business), 1, 5)
+    user_activity = rng.pareto(1.2, n_users) + 1
+
+    # Los ids se generan antes para poder escribir las reseñas en bloques
+    user_ids = make_ids(rng, n_users)
+    business_ids = make_ids(rng, n_business)
+
+    review_counts = np.zeros(n_business, dtype="int64")
+    star_sums = np.zeros(n_business, dtype="float64")
+    user_counts = np.zeros(n_users, dtype="int64")
+    user_stars = np.zeros(n_users, dtype="float64")
+
+    p_business = popularity / popularity.sum()
+    p_user = user_activity / user_activity.sum()
+
+    with open(os.path.join(out_dir, "yelp_academic_dataset_review.json"), "w", encoding="utf-8") as f:
+        for start in range(0, n_reviews, CHUNK_REVIEWS):
+            n = min(CHUNK_REVIEWS, n_reviews - start)
+            chunk_rng = np.random.default_rng([seed, 3, start])
+            b = chunk_rng.choice(n_business, size=n, p=p_business)
+            u = chunk_rng.choice(n_users, size=n, p=p_user)
+            stars = review_stars(chunk_rng, quality[b])
+            votes = chunk_rng.geometric(0.5, size=(n, 3)) - 1
+            dates = format_dates(chunk_rng, n, recent=True)
+            ids = make_ids(chunk_rng, n)
+            text_len = chunk_rng.integers(5, 40, size=n)
+            words = chunk_rng.integers(0, len(WORDS), size=(n, 40))
+
+            np.add.at(review_counts, b, 1)
+            np.add.at(star_sums, b, stars)
+            np.add.at(user_counts, u, 1)
+            np.add.at(user_stars, u, stars)
+
+            lines = [
+                json.dumps({
+                    "review_id": ids[i],
+                    "user_id": user_ids[u[i]],
+                    "business_id": business_ids[b[i]],
+                    "stars": float(stars[i]),
+                    "useful": int(votes[i, 0]),
+                    "funny": int(votes[i, 1]),
+                    "cool": int(votes[i, 2]),
+                    "text": " ".join(WORDS[w] for w in words[i, :text_len[i]]).capitalize() + ".",
+                    "date": dates[i],
+                })
+                for i in range(n)
+            ]
+            f.write("\n".join(lines) + "\n")
+
+    mean_stars = np.divide(star_sums, review_counts, out=np.zeros(n_business), where=review_counts > 0)
+    with open(os.path.join(out_dir, "yelp_academic_dataset_business.json"), "w", encoding="utf-8") as f:
+        business_rng = np.random.default_rng([seed, 4])
+        for record in business_records(business_rng, business_ids, review_counts, mean_stars):
+            f.write(json.dumps(record) + "\n")
+
+    with open(os.path.join(out_dir, "yelp_academic_dataset_user.json"), "w", encoding="utf-8") as f:
+        user_rng = np.random.default_rng([seed, 5])
+        fans = np.floor(user_counts * user_rng.pareto(2.0, n_users) * 0.1).astype("int64")
+        since = format_dates(user_rng, n_users)
+        # Élite: la mitad de los usuarios muy activos, durante 1-4 años
+        is_elite = (user_counts >= 20) & (user_rng.random(n_users) < 0.5)
+        elite_first = user_rng.integers(2010, 2020, size=n_users)
+        elite_years = user_rng.integers(1, 5, size=n_users)
+        for i in range(n_users):
+            elite = ""
+            if is_elite[i]:
+                elite = ",".join(str(year) for year in range(elite_first[i], min(elite_first[i] + elite_years[i], 2022)))
+            f.write(json.dumps({
+                "user_id": user_ids[i],
+                "name": f"User {i}",
+                "review_count": int(user_counts[i]),
+                "yelping_since": since[i],
+                "useful": int(user_counts[i] * 2),
+                "funny": int(user_counts[i] // 2),
+                "cool": int(user_counts[i]),
+                "elite": elite,
+                "friends": "None",
+                "fans": int(fans[i]),
+                "average_stars": round(float(user_stars[i] / user_counts[i]), 2) if user_counts[i] else 0.0,
+            }) + "\n")
+
+    return {"reviews": n_reviews, "business": n_business, "users": n_users}
+
+if __name__ == "__main__":
+    # python -m benchmarks.generate <reviews> <directorio> [semilla]
+    n_reviews = int(sys.argv[1])
+    out_dir = sys.argv[2]
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else SEED
+    counts = generate(n_reviews, out_dir, seed)
+    print(f"✅ Generados {counts['business']} negocios, {counts['reviews']} reviews y {counts['users']} usuarios en {out_dir}")
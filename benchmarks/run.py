@@ -0,0 +1,185 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import pyarrow as pa
+from pymongo import MongoClient
+
+from benchmarks.generate import generate, sizes
+from etl.pipeline import STAGES, topological_order
+
+# Tamaños (número de reviews) a medir y MongoDB de pruebas. Cada tamaño usa
+# su propia base de datos (yelp_bench_<tamaño>), que se borra antes de medir.
+BENCH_SIZES = [int(size) for size in os.environ.get("BENCH_SIZES", "10000,100000").split(",")]
+BENCH_MONGO_URI = os.environ.get("BENCH_MONGO_URI", "mongodb://localhost:27017/")
+BENCH_PATH = os.environ.get("BENCH_PATH", "bench")
+RESULTS_PATH = os.path.join(BENCH_PATH, "results")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Unidad de trabajo de cada etapa para calcular el throughput
+STAGE_UNITS = {
+    "load": "records",
+    "schema": "reviews",
+    "clean": "reviews",
+    "review_stats": "reviews",
+    "credibility": "reviews",
+    "cube": "reviews",
+    "features": "business",
+    "clustering": "business",
+    "categories": "business",
+    "topk": "business",
+    "geo": "business",
+    "neighbors": "business",
+    "dashboard": "business",
+}
+
+def run_measured(args, cwd, env, log_path):
+    """
+    Ejecuta un proceso con su salida en log_path y devuelve (código de
+    salida, segundos, pico de RSS en MB). El pico es el del proceso más
+    grande entre el proceso y los hijos que ha esperado (los procesos de los
+    pools de cada etapa).
+    """
+    with open(log_path, "w", encoding="utf-8") as log:
+        start = time.perf_counter()
+        process = subprocess.Popen(args, cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(process.pid, 0)
+        seconds = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return process.returncode, seconds, usage.ru_maxrss / scale
+
+def business_rows(work_dir):
+    # Negocios que llegan a las etapas de análisis (tras la limpieza)
+    path = os.path.join(work_dir, "data", "reviews_business.arrow")
+    if not os.path.exists(path):
+        return 0
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).read_all().num_rows
+
+def bench_size(n_reviews, run_dir):
+    """
+    Genera el dataset sintético de un tamaño y ejecuta todas las etapas del
+    pipeline en orden, una a una para que el pico de memoria sea de cada
+    etapa. Al final mide una carga y un rerun del dashboard.
+    """
+    work_dir = os.path.join(run_dir, str(n_reviews))
+    raw_dir = os.path.join(BENCH_PATH, "raw", str(n_reviews))
+    db_name = f"yelp_bench_{n_reviews}"
+
+    if not os.path.exists(os.path.join(raw_dir, "yelp_academic_dataset_review.json")):
+        print(f"🧪 Generando {n_reviews} reviews sintéticas en {raw_dir}...")
+        generate(n_reviews, raw_dir)
+    n_business, _ = sizes(n_reviews)
+
+    MongoClient(BENCH_MONGO_URI).drop_database(db_name)
+    os.makedirs(os.path.join(work_dir, "data"), exist_ok=True)
+    os.makedirs(os.path.join(work_dir, "logs"), exist_ok=True)
+    env = dict(
+        os.environ,
+        PYTHONPATH=ROOT,
+        PYTHONUNBUFFERED="1",
+        MONGO_URI=BENCH_MONGO_URI,
+        MONGO_DB=db_name,
+        RAW_PATH=os.path.abspath(raw_dir),
+    )
+
+    results = []
+    stages = [(name, ["-m", STAGES[name]["module"]]) for name in topological_order()]
+    stages.append(("dashboard", ["-m", "benchmarks.dashboard"]))
+    for name, args in stages:
+        log_path = os.path.join(work_dir, "logs", f"{name}.log")
+        code, seconds, peak_rss = run_measured([sys.executable] + args, work_dir, env, log_path)
+        unit = STAGE_UNITS.get(name, "reviews")
+        items = {
+            "records": n_reviews + n_business,
+            "reviews": n_reviews,
+            "business": business_rows(work_dir) or n_business,
+        }[unit]
+        result = {
+            "size": n_reviews,
+            "stage": name,
+            "status": "ok" if code == 0 else "failed",
+            "seconds": round(seconds, 3),
+            "peak_rss_mb": round(peak_rss, 1),
+            "unit": unit,
+            "items": items,
+            "items_per_s": round(items / seconds, 1) if seconds > 0 else None,
+        }
+        detail_path = os.path.join(work_dir, "data", f"{name}_bench.json")
+        if os.path.exists(detail_path):
+            with open(detail_path, encoding="utf-8") as f:
+                result["detail"] = json.load(f)
+        results.append(result)
+        print(f"   {name:<13} {seconds:8.2f} s  {peak_rss:8.1f} MB  {result['items_per_s']} {unit}/s")
+        if code != 0:
+            print(f"❌ La etapa {name} falló, ver {log_path}")
+            break
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark(bench_sizes=BENCH_SIZES):
+    """
+    Ejecuta la batería para cada tamaño y guarda los resultados en
+    bench/results/<fecha>.json junto con el commit y la máquina, para poder
+    comparar ejecuciones.
+    """
+    run_id = datetime.now().strftime("%Y%m%dT%H%M%S")
+    run_dir = os.path.join(BENCH_PATH, "runs", run_id)
+    report = {
+        "run": run_id,
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "mongo_uri": BENCH_MONGO_URI,
+        "results": [],
+    }
+    for n_reviews in bench_sizes:
+        print(f"⏱️  Benchmark con {n_reviews} reviews")
+        report["results"].extend(bench_size(n_reviews, run_dir))
+
+    os.makedirs(RESULTS_PATH, exist_ok=True)
+    path = os.path.join(RESULTS_PATH, f"{run_id}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Resultados guardados en {path}")
+    return path
+
+def compare(baseline_path, current_path):
+    """
+    Compara dos ficheros de resultados: ratio de tiempo y de memoria por
+    etapa y tamaño (>1 es más lento o usa más memoria que la referencia).
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["size"], r["stage"]): r for r in json.load(f)["results"]}
+    with open(current_path, encoding="utf-8") as f:
+        current = json.load(f)["results"]
+
+    print(f"{'tamaño':>10} {'etapa':<13} {'tiempo':>8} {'ratio':>6} {'RSS MB':>8} {'ratio':>6}")
+    for r in current:
+        base = baseline.get((r["size"], r["stage"]))
+        time_ratio = r["seconds"] / base["seconds"] if base and base["seconds"] else float("nan")
+        rss_ratio = r["peak_rss_mb"] / base["peak_rss_mb"] if base and base["peak_rss_mb"] else float("nan")
+        print(f"{r['size']:>10} {r['stage']:<13} {r['seconds']:>8.2f} {time_ratio:>6.2f} {r['peak_rss_mb']:>8.1f} {rss_ratio:>6.2f}")
+
+if __name__ == "__main__":
+    # python -m benchmarks.run                       -> ejecuta la batería
+    # python -m benchmarks.run <referencia> <actual> -> compara dos resultados
+    if len(sys.argv) == 3:
+        compare(sys.argv[1], sys.argv[2])
+    else:
+        run_benchmark()
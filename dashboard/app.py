@@ -1,11 +1,19 @@
 # python
+import os
+
 import streamlit as st
 import pandas as pd
-import pydeck as pdk
 import altair as alt
-import numpy as np
 
-global filtered, all_cats
+from dashboard.data import CLASSIFICATION, load_dataset
+from dashboard.geo import map_deck
+from dashboard.lod import lod_scatter
+from dashboard.trends import WINDOW, monthly_trend, trend_chart
+from etl.neighbors import similar_businesses
+from etl.categories import category_options
+from etl.profiling import lap, new_report, write_report
+
+global filtered, all_cats, filter_result, selection
 
 # Page config
 st.set_page_config(
@@ -13,46 +21,18 @@ st.set_page_config(
     layout="wide"
 )
 
-# Data load
-df = pd.read_csv("data/business_clustered.csv")
-
-# Percentiles usados para la clasificación
-mean_review = df["review_count"].mean()
-outstanding_review = mean_review * 10
-
-mean_rps = df["review_power_score"].mean()
-
-p25_reviews = df["review_count"].quantile(0.25)
-# st.text("Percentil 25 de reviews:")
-# st.text(p25_reviews)
-p95_reviews = df["review_count"].quantile(0.95)
-# st.text("Percentil 95 de reviews:")
-# st.text(p95_reviews)
-p25_stars = df["stars_avg"].quantile(0.25)
-# st.text("Percentil 25 de stars:")
-# st.text(p25_stars)
-p90_stars = df["stars_avg"].quantile(0.90)
-# st.text("Percentil 90 de stars:")
-# st.text(p90_stars)
-p80_stars = df["stars_avg"].quantile(0.80)
-# st.text("Percentil 80 de stars:")
-# st.text(p80_stars)
-p90_rps = df["review_power_score"].quantile(0.95)
-# st.text("Percentil 90 de RPS:")
-# st.text(p90_rps)
-p25_rps = df["review_power_score"].quantile(0.25)
-# st.text("Percentil 25 de RPS:")
-# st.text(p25_rps)
-
-# Clasificación de negocios según criterios definidos
-CLASSIFICATION = {
-    "overrated": "Sobrevalorados",
-    "bad_business": "Mal negocio",
-    "best_perceived_quality": "Mejor calidad percibida (RPS)",
-    "best_rated": "Mejor valorados",
-    "worst_rated": "Peor valorados",
-    "others": "Otros",
-}
+# Perfil del rerun: tiempo y memoria de cada bloque (panel con DASHBOARD_DEBUG=1 o ?debug=1)
+debug = os.environ.get("DASHBOARD_DEBUG") == "1" or st.query_params.get("debug") == "1"
+profile_report = new_report("dashboard")
+
+# Data load (compartido entre sesiones, ver dashboard/data.py)
+dataset = load_dataset()
+df = dataset["df"]
+category_index = dataset["categories"]
+filter_index = dataset["filters"]
+query = dataset["query"]
+mean_rps = dataset["thresholds"]["mean_rps"]
+lap("load_dataset", rows=len(df))
 
 # Mapa de colores por clasificación
 color_map = {
@@ -69,23 +49,6 @@ color_domain = list(color_map.keys())
 color_range = list(color_map.values())
 color_scale = alt.Scale(domain=color_domain, range=color_range)
 
-# Clasificación basada en las reglas definidas
-def classify(row):
-    if row["review_power_score"] >= p90_rps and row["stars_avg"] >= 4.0:
-        return CLASSIFICATION["best_perceived_quality"]
-    if row["review_count"] <= p25_reviews and row["stars_avg"] >= p80_stars:
-        return CLASSIFICATION["overrated"]
-    if row["review_count"] >= mean_review and row["stars_avg"] >= p80_stars:
-        return CLASSIFICATION["best_rated"]
-    if row["review_count"] >= p95_reviews and row["stars_avg"] <= p25_stars:
-        return CLASSIFICATION["bad_business"]
-    if row["stars_avg"] <= p25_stars and row["review_count"] <= p25_reviews:
-        return CLASSIFICATION["worst_rated"]
-    return CLASSIFICATION["others"]
-
-# Aplicar clasificación
-df["sector"] = df.apply(classify, axis=1)
-
 # Funciones auxiliares
 def separator():
     st.markdown(" \n")
@@ -121,6 +84,7 @@ c1.metric("🏢 Total de negocios", len(df))
 c2.metric("⭐ Valoración media", round(df["stars_avg"].mean(), 2))
 c3.metric("🧾 Cantidad de reviews media", int(df["review_count"].mean()))
 c4.metric("📈 RPS medio", round(mean_rps, 2))
+lap("overview_metrics")
 
 separator()
 
@@ -129,18 +93,19 @@ with st.container(border=True):
 
     with c1:
         st.markdown("#### Distribución de valoraciones (estrellas)")
+        # Barras ya agregadas en dashboard/data.py: solo se envían los recuentos
         star_chart = (
-            alt.Chart(df)
+            alt.Chart(dataset["histograms"]["stars"])
             .mark_bar()
             .encode(
                 x=alt.X("stars:O", title="Valoración (⭐)"),
-                y=alt.Y("count():Q", title="Cantidad de negocios"),
+                y=alt.Y("count:Q", title="Cantidad de negocios"),
                 color=alt.Color(
                     "stars:Q",
                     scale=alt.Scale(range=["#E53935", "#4CAF50"]),
                     legend=None
                 ),
-                tooltip=[alt.Tooltip("count():Q", title="Cantidad de negocios")],
+                tooltip=[alt.Tooltip("count:Q", title="Cantidad de negocios")],
             )
         )
         st.altair_chart(star_chart, width='stretch')
@@ -148,12 +113,13 @@ with st.container(border=True):
     with c2:
         st.markdown("#### Distribución por RPS")
         rps_chart = (
-            alt.Chart(df)
+            alt.Chart(dataset["histograms"]["rps"])
+            .transform_calculate(rps_mid="(datum.review_power_score + datum.review_power_score_end) / 2")
             .mark_line(interpolate="monotone")
             .encode(
-                x=alt.X("review_power_score:Q", bin=alt.Bin(maxbins=50), title="Review Power Score (RPS)"),
-                y=alt.Y("count():Q", title="Cantidad de negocios"),
-                tooltip=[alt.Tooltip("count():Q", title="Cantidad de negocios")],
+                x=alt.X("rps_mid:Q", title="Review Power Score (RPS)"),
+                y=alt.Y("count:Q", title="Cantidad de negocios"),
+                tooltip=[alt.Tooltip("count:Q", title="Cantidad de negocios")],
             )
         )
         st.altair_chart(rps_chart, width='stretch')
@@ -167,6 +133,7 @@ with st.container(border=True):
         #     )
         # )
         # st.altair_chart(review_chart, width='stretch')
+lap("overview_charts")
 
 separator()
 
@@ -176,7 +143,7 @@ st.markdown("##### Estos negocios muestran la mayor calidad percibida, por lo qu
 
 with st.container(border=True):
 
-    gold = df.sort_values("review_power_score", ascending=False).head(10)
+    gold = df.iloc[query()["top"]]
 
     st.dataframe(
         gold[[ "review_power_score", "name", "categories", "city", "stars_avg", "review_count"]],
@@ -199,6 +166,7 @@ with st.container(border=True):
         file_name="oportunidades_oro.csv",
         type="primary"
     )
+lap("gold_table", rows=len(gold))
 
 separator()
 
@@ -220,27 +188,13 @@ with st.container(border=True):
 
     c1, c2 = st.columns(2)
     with c1:
-        # Mapeo de nombres y colores por cluster
-        cluster_name_map = {
-            0: "Pocas reseñas, alta valoración",
-            1: "Pocas reseñas, baja valoración",
-            2: "Muchas reseñas, baja valoración",
-            3: "Muchas reseñas, alta valoración",
-        }
-        cluster_color_map = {
-            "Pocas reseñas, alta valoración": "#FFEB3B",  # amarillo
-            "Pocas reseñas, baja valoración": "#E53935",  # rojo
-            "Muchas reseñas, baja valoración": "#1E88E5",  # azul
-            "Muchas reseñas, alta valoración" : "#4CAF50",  # verde
-        }
+        # Colores por cluster (etiquetas y colores guardados con el modelo de clustering)
+        cluster_color_map = dataset["cluster_colors"]
         cluster_domain = list(cluster_color_map.keys())
         cluster_range = list(cluster_color_map.values())
 
         # Preparar datos con etiqueta del cluster
-        plot_cluster_df = df.assign(
-            log_review_count=np.log10(df["review_count"]) - 1,
-            cluster_label=df["cluster"].map(cluster_name_map).fillna("Otros")
-        )
+        plot_cluster_df = df
 
         custom_legend = alt.Legend(
             title="Cluster",
@@ -253,9 +207,8 @@ with st.container(border=True):
 
         # Dispersión con leyenda de cluster personalizada
         cluster_scatter = (
-            alt.Chart(plot_cluster_df)
-            .mark_circle(size=60, opacity=0.7)
-            .encode(
+            lod_scatter(
+                plot_cluster_df,
                 x=alt.X("log_review_count:Q", title="Cantidad de reseñas (log10) - 1"),
                 y=alt.Y("stars_avg:Q", title="Valoración (⭐)", scale=alt.Scale(domain=[0.5, 5.5])),
                 color=alt.Color(
@@ -285,12 +238,10 @@ with st.container(border=True):
             labelExpr="replace(datum.label, ' (', '\\n(')"  # salto de línea antes del paréntesis
         )
 
-        plot_df = df.assign(log_review_count=np.log10(df["review_count"]) - 1)
-        # plot_df = filtered.assign(log_review_count=filtered["review_count"])
+        plot_df = df
         chart = (
-            alt.Chart(plot_df)
-            .mark_circle(size=60, opacity=0.7)
-            .encode(
+            lod_scatter(
+                plot_df,
                 x=alt.X("log_review_count:Q", title="Cantidad de reseñas (log10) - 1"),
                 y=alt.Y("stars_avg:Q", title="Valoración", scale=alt.Scale(domain=[0.5, 5.5])),
                 color=alt.Color(
@@ -309,10 +260,11 @@ with st.container(border=True):
         )
 
         st.altair_chart(chart, width='stretch')
+lap("segment_charts", rows=len(df))
 
 
 def render_filters():
-    global filtered, all_cats
+    global filtered, all_cats, filter_result, selection
 
     st.header("Filtros")
 
@@ -325,42 +277,29 @@ def render_filters():
     )
 
     # State filter
-    states = ["Todos"] + sorted(df["state"].dropna().unique())
+    states = ["Todos"] + filter_index["states"]
     state = st.selectbox("Estado", states)
 
-    filtered = df.copy()
-    if state != "Todos":
-        filtered = filtered[filtered["state"] == state]
-
     # City filter (based on state filter)
     if state != "Todos":
-        cities = ["Todas"] + sorted(filtered["city"].dropna().unique())
+        cities = ["Todas"] + filter_index["cities"].get(state, [])
         city = st.selectbox("Ciudad", cities)
-        if city != "Todas":
-            filtered = filtered[filtered["city"] == city]
     else:
         city = "Todas"
 
     # Category filter (based on state and city filter)
-    if "categories" in filtered.columns:
-        all_cats = set()
-        filtered["categories"].dropna().apply(
-            lambda x: all_cats.update([c.strip() for c in x.split(",")])
-        )
-        category = st.selectbox("Categoría", ["Todas"] + sorted(all_cats))
-        if category != "Todas":
-            filtered = filtered[filtered["categories"].str.contains(category, na=False)]
+    if "categories" in df.columns:
+        rows = None if state == "Todos" else query(state, city)["rows"]
+        all_cats = category_options(category_index, rows)
+        category = st.selectbox("Categoría", ["Todas"] + all_cats)
     else:
         category = "Todas"
 
-    # Aplicación final de filtros combinados
-    filtered = df.copy()
-    if state != "Todos":
-        filtered = filtered[filtered["state"] == state]
-    if city != "Todas":
-        filtered = filtered[filtered["city"] == city]
-    if category != "Todas":
-        filtered = filtered[filtered["categories"].str.contains(category, na=False)]
+    # Aplicación final de filtros combinados (resultado cacheado por combinación)
+    filter_result = query(state, city, category)
+    filtered = df.iloc[filter_result["rows"]]
+    selection = (state, city, category)
+    lap("filters", rows=len(filtered))
 
 # Segmentación por valoración y cantidad de reseñas
 st.markdown("## 🔍 Datos segmentados por RPS y percentiles")
@@ -374,12 +313,10 @@ with st.container(border=True):
     with col_center:
         st.markdown("### Gráfica de dispersión")
 
-        plot_df = filtered.assign(log_review_count=np.log10(filtered["review_count"]) - 1)
-        # plot_df = filtered.assign(log_review_count=filtered["review_count"])
+        plot_df = filtered
         chart = (
-            alt.Chart(plot_df)
-            .mark_circle(size=60, opacity=0.7)
-            .encode(
+            lod_scatter(
+                plot_df,
                 x=alt.X("log_review_count:Q", title="Cantidad de reseñas (log10) - 1"),
                 y=alt.Y("stars_avg:Q", title="Valoración", scale=alt.Scale(domain=[0.5, 5.5])),
                 color=alt.Color("sector:N", scale=color_scale, legend=None),
@@ -398,11 +335,12 @@ with st.container(border=True):
 
     with col_left:
         # Contadores por etiqueta y etiquetas enriquecidas
-        sector_counts = filtered["sector"].value_counts()
+        sector_counts = filter_result["sector_counts"]
         legend_html = "".join(legend_item(lbl,sector_counts) for lbl in color_domain)
 
         st.markdown("### Leyenda y conteos")
         st.markdown(legend_html, unsafe_allow_html=True)
+    lap("filtered_chart", rows=len(filtered))
 
 
 
@@ -414,7 +352,7 @@ with st.container(border=True):
 
     st.warning(
         f"Un RPS por debajo de la media (≈ {mean_rps_str}) puede indicar que no son las mejores oportunidades de inversión.")
-    filtered_gold = filtered.sort_values("review_power_score", ascending=False).head(10)
+    filtered_gold = df.iloc[filter_result["top"]]
 
     st.dataframe(
         filtered_gold[[ "review_power_score", "name", "categories", "city", "stars_avg", "review_count"]],
@@ -437,28 +375,100 @@ with st.container(border=True):
         file_name="oportunidades_oro.csv",
         type="secondary"
     )
+    lap("filtered_gold", rows=len(filtered_gold))
 
     separator()
 
+    # Detalle de un negocio del top filtrado: evolución mensual y competencia cercana
+    if dataset["cube"] is not None or dataset["similar"] is not None:
+        st.markdown("## 🔎 Detalle por negocio")
+        business = st.selectbox(
+            "Negocio",
+            [None] + [int(row) for row in filter_result["top"]],
+            format_func=lambda row: "Todos los negocios filtrados" if row is None else df["name"].iat[row],
+        )
+
+    # Evolución mensual desde el cubo (negocio × mes) del ETL, sin leer las reviews
+    if dataset["cube"] is not None:
+        st.markdown("### 📅 Evolución mensual de las reseñas")
+        trend_rows = filter_result["rows"] if business is None else [business]
+        series = monthly_trend(dataset["cube"], trend_rows)
+
+        if business is not None and {"rps_12m", "reviews_12m", "trend_slope"}.issubset(df.columns):
+            c1, c2, c3 = st.columns(3)
+            slope = df["trend_slope"].iat[business]
+            c1.metric(f"📈 RPS últimos {WINDOW} meses", f"{df['rps_12m'].iat[business]:.2f}")
+            c2.metric(f"🧾 Reseñas últimos {WINDOW} meses", int(df["reviews_12m"].fillna(0).iat[business]))
+            c3.metric("↗️ Tendencia (⭐/año)", "N/A" if pd.isna(slope) else f"{slope:+.2f}")
+
+        if series.empty:
+            st.info("No hay reseñas con fecha para la selección.")
+        else:
+            st.altair_chart(trend_chart(series), width='stretch')
+        lap("trend", rows=len(series))
+
+    # Competidores (alguna categoría en común) y similares de la misma categoría principal precalculados en el ETL
+    if dataset["similar"] is not None:
+        st.markdown("### 🧭 Negocios similares cerca")
+        if business is None:
+            st.info("Selecciona un negocio para ver su competencia cercana.")
+        else:
+            radius_columns = [col for col in df.columns if col.startswith("competitors_")]
+            percentile = df["rps_peer_percentile"].iat[business]
+            columns = st.columns(len(radius_columns) + 1)
+            for column, col in zip(columns, radius_columns):
+                column.metric(f"🏪 Competidores a {col[len('competitors_'):-2]} km", int(df[col].iat[business]))
+            columns[-1].metric(
+                "🏅 Percentil de RPS entre vecinos", "N/A" if pd.isna(percentile) else f"{percentile:.0f}"
+            )
+
+            neighbors, distances = similar_businesses(dataset["similar"], business)
+            similar = df.iloc[neighbors][["name", "categories", "city", "review_power_score", "stars_avg", "review_count"]]
+            st.caption(f"Misma categoría principal: {df['primary_category'].iat[business]}")
+            st.dataframe(
+                similar.assign(distance_km=distances),
+                width='stretch',
+                hide_index=True,
+                column_config={
+                    "name": st.column_config.TextColumn(label="Nombre"),
+                    "categories": st.column_config.TextColumn(label="Categorías"),
+                    "city": st.column_config.TextColumn(label="Ciudad"),
+                    "review_power_score": st.column_config.NumberColumn(label="RPS", format="%.2f"),
+                    "stars_avg": st.column_config.NumberColumn(label="Valoración (⭐)", format="%.2f"),
+                    "review_count": st.column_config.NumberColumn(label="Reseñas"),
+                    "distance_km": st.column_config.NumberColumn(label="Distancia (km)", format="%.2f"),
+                },
+            )
+        lap("similar")
+
+    if dataset["cube"] is not None or dataset["similar"] is not None:
+        separator()
+
     # Mapa de distribución geográfica
     if {"latitude", "longitude"}.issubset(filtered.columns):
         st.markdown("## 🗺️ Distribución geográfica")
         st.pydeck_chart(
-            pdk.Deck(
-                initial_view_state=pdk.ViewState(
-                    latitude=filtered["latitude"].mean(),
-                    longitude=filtered["longitude"].mean(),
-                    zoom=4,
+            map_deck(dataset["geo"], df, filter_result["rows"], *selection, color_map=color_map)
+        )
+        lap("map", rows=len(filtered))
+
+# Panel de depuración: desglose del rerun que acaba de terminar
+if debug:
+    write_report(profile_report, keep_history=False)
+    with st.expander("🐞 Perfil del último rerun", expanded=False):
+        sections = pd.DataFrame(profile_report["sections"])[["name", "seconds", "rows_out", "rss_end_mb", "peak_rss_mb"]]
+        st.metric("⏱️ Tiempo total", f"{sections['seconds'].sum():.3f} s")
+        st.dataframe(
+            sections,
+            width='stretch',
+            hide_index=True,
+            column_config={
+                "name": st.column_config.TextColumn(label="Bloque"),
+                "seconds": st.column_config.ProgressColumn(
+                    label="Segundos", format="%.3f", min_value=0.0, max_value=float(sections["seconds"].max())
                 ),
-                layers=[
-                    pdk.Layer(
-                        "ScatterplotLayer",
-                        data=filtered,
-                        get_position="[longitude, latitude]",
-                        get_radius=60,
-                        get_color="[255, 99, 71, 160]",
-                        pickable=True,
-                    )
-                ],
-            )
+                "rows_out": st.column_config.NumberColumn(label="Filas"),
+                "rss_end_mb": st.column_config.NumberColumn(label="RSS (MB)", format="%.1f"),
+                "peak_rss_mb": st.column_config.NumberColumn(label="Pico RSS (MB)", format="%.1f"),
+            },
         )
@@ -0,0 +1,142 @@
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from analysis.clustering import MODEL_PATH, OTHER_COLOR, cluster_palette
+from dashboard.lod import histogram
+from dashboard.query import build_filter_index, make_query
+from dashboard.trends import cube_index
+from etl.artifacts import artifact_path, read_artifact, read_table
+from etl.categories import INDEX_PATH, build_category_index, load_category_index, prepare_lookup
+from etl.geo import PRECISIONS, bounds_lookup, build_geo
+from etl.neighbors import similar_lookup
+from etl.segmentation import CLASSIFICATION, compute_thresholds, segment
+from etl.topk import topk_lookup
+
+DATASET = "business_clustered"
+
+def _is_fresh(name, mtime):
+    # El artefacto existe y se generó después del dataset
+    path = artifact_path(name)
+    return os.path.exists(path) and os.path.getmtime(path) >= mtime
+
+def _prepare_frame(df):
+    """
+    Percentiles de la segmentación y columnas derivadas. El ETL guarda la
+    segmentación; solo se recalcula si falta.
+    """
+    thresholds = compute_thresholds(df)
+    df["log_review_count"] = np.log10(df["review_count"]) - 1
+    if "sector" not in df.columns:
+        df["sector"] = segment(df, thresholds)
+    return thresholds
+
+def _load_categories(df, mtime):
+    # Índice de categorías del ETL; si no existe o no corresponde al dataset se construye aquí
+    if os.path.exists(INDEX_PATH) and os.path.getmtime(INDEX_PATH) >= mtime:
+        index = load_category_index()
+        if index["membership"].shape[0] == len(df):
+            return index
+    return build_category_index(df["categories"])
+
+def _load_topk(mtime):
+    # Listas top k por RPS del ETL, si corresponden a este dataset
+    if _is_fresh("topk_rps", mtime):
+        return topk_lookup(read_artifact("topk_rps"))
+    return None
+
+def _load_geo(df, mtime):
+    """
+    Capa geoespacial del ETL (celdas y límites); si falta o no corresponde al
+    dataset se calcula aquí. Devuelve las celdas de cada negocio, las celdas
+    por nivel y los límites.
+    """
+    names = ("geo_index", "geo_cells", "geo_bounds")
+    geo = None
+    if all(_is_fresh(name, mtime) for name in names):
+        geo = {name: read_artifact(name) for name in names}
+        if len(geo["geo_index"]) != len(df):
+            geo = None
+    if geo is None:
+        geo = build_geo(df)
+    return {
+        "index": {level: geo["geo_index"][f"cell_{level}"].to_numpy() for level in PRECISIONS},
+        "cells": {level: cells.reset_index(drop=True) for level, cells in geo["geo_cells"].groupby("level", observed=True)},
+        "bounds": bounds_lookup(geo["geo_bounds"]),
+    }
+
+def _load_cube(df):
+    # Cubo mensual de reviews (etapa anterior al dataset, así que basta con que exista)
+    if os.path.exists(artifact_path("review_cube")):
+        return cube_index(read_table("review_cube"), df["business_id"].to_numpy())
+    return None
+
+def _load_neighbors(df, mtime):
+    """
+    Competencia cercana y vecinos similares del ETL, si corresponden a este
+    dataset: añade las columnas de competencia a df y devuelve los vecinos.
+    """
+    if not (_is_fresh("business_neighbors", mtime) and _is_fresh("business_similar", mtime)):
+        return None
+    neighbors = read_artifact("business_neighbors")
+    if len(neighbors) != len(df):
+        return None
+    for col in neighbors.columns:
+        df[col] = neighbors[col].to_numpy()
+    return similar_lookup(read_artifact("business_similar"))
+
+def _load_cluster_colors(df):
+    # Colores de los clusters guardados con el modelo; las etiquetas que no
+    # estén en el modelo (o si no hay modelo) se pintan en gris
+    colors = cluster_palette(joblib.load(MODEL_PATH)) if os.path.exists(MODEL_PATH) else {}
+    if "cluster_label" in df.columns:
+        for label in df["cluster_label"].astype(str).unique():
+            colors.setdefault(label, OTHER_COLOR)
+    return colors
+
+def _load_histograms(df):
+    """
+    Histogramas de la visión general calculados una vez: el navegador recibe
+    unas decenas de barras en lugar de una fila por negocio.
+    """
+    stars, counts = np.unique(df["stars"].dropna().to_numpy(dtype="float64"), return_counts=True)
+    return {
+        "stars": pd.DataFrame({"stars": stars, "count": counts}),
+        "rps": histogram(df["review_power_score"], "review_power_score"),
+    }
+
+@st.cache_resource(show_spinner="Cargando datos...", max_entries=1)
+def _load_dataset(mtime):
+    """
+    Carga el artefacto DATASET y lo que el dashboard necesita junto a él.
+    Se ejecuta una vez por proceso y versión del fichero (mtime es la clave de
+    caché): todas las sesiones comparten el mismo objeto, que no debe
+    modificarse (solo lectura).
+    """
+    df = read_artifact(DATASET)
+    thresholds = _prepare_frame(df)
+    similar = _load_neighbors(df, mtime)
+    category_lookup = prepare_lookup(_load_categories(df, mtime))
+    filter_index = build_filter_index(df)
+    return {
+        "df": df,
+        "thresholds": thresholds,
+        "categories": category_lookup,
+        "filters": filter_index,
+        "query": make_query(df, filter_index, category_lookup, _load_topk(mtime)),
+        "geo": _load_geo(df, mtime),
+        "cube": _load_cube(df),
+        "cluster_colors": _load_cluster_colors(df),
+        "histograms": _load_histograms(df),
+        "similar": similar,
+    }
+
+def load_dataset():
+    """
+    Devuelve el dataset compartido. La clave de caché incluye la fecha de
+    modificación del artefacto, así que al regenerarlo se vuelve a cargar.
+    """
+    return _load_dataset(os.path.getmtime(artifact_path(DATASET)))
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pydeck as pdk
+
+from etl.geo import PRECISIONS, aggregate_cells, cell_size_km
+
+# Con ciudad seleccionada se envían los negocios individuales, solo con estas columnas
+POINT_COLUMNS = ["longitude", "latitude", "review_power_score", "name"]
+POINT_COLOR = [255, 99, 71, 160]
+
+def _rgba(hex_color, alpha=170):
+    hex_color = hex_color.lstrip("#")
+    return [int(hex_color[i:i + 2], 16) for i in (0, 2, 4)] + [alpha]
+
+def map_cells(geo, df: pd.DataFrame, rows, level, filtered=True):
+    """
+    Celdas agregadas del nivel dado para las filas filtradas. Sin filtros se
+    usan directamente las celdas precalculadas en el ETL; con filtros se
+    reagrupan las filas por su celda ya calculada (geo_index).
+    """
+    if not filtered:
+        return geo["cells"][level]
+    codes = geo["index"][level][rows]
+    return aggregate_cells(df.iloc[rows], codes)
+
+def map_deck(geo, df: pd.DataFrame, rows, state="Todos", city="Todas", category="Todas", color_map=None):
+    """
+    Mapa pydeck con nivel de detalle: celdas agregadas (número de negocios,
+    RPS medio y sector predominante) para la vista global y de estado, y
+    puntos individuales con las columnas mínimas al elegir ciudad. La vista
+    inicial sale de los límites precalculados del estado o la ciudad.
+    """
+    color_map = color_map or {}
+    view = geo["bounds"].get((state, city)) or geo["bounds"][("Todos", "Todas")]
+
+    if city != "Todas":
+        layer = pdk.Layer(
+            "ScatterplotLayer",
+            data=df.iloc[rows][POINT_COLUMNS].assign(review_power_score=lambda d: d["review_power_score"].round(2)),
+            get_position="[longitude, latitude]",
+            get_radius=60,
+            get_fill_color=POINT_COLOR,
+            pickable=True,
+        )
+        tooltip = {"text": "{name}\nRPS: {review_power_score}"}
+    else:
+        level = "global" if state == "Todos" else "state"
+        unfiltered = state == "Todos" and category == "Todas"
+        cells = map_cells(geo, df, rows, level, filtered=not unfiltered)
+        # Radio proporcional a la raíz del número de negocios, como máximo media celda
+        half_cell = cell_size_km(PRECISIONS[level]) * 500
+        radius = half_cell * np.sqrt(cells["count"] / max(cells["count"].max(), 1))
+        data = pd.DataFrame({
+            "longitude": cells["longitude"],
+            "latitude": cells["latitude"],
+            "count": cells["count"],
+            "mean_rps": cells["mean_rps"].round(2),
+            "dominant_sector": cells["dominant_sector"].astype(str),
+            "radius": np.maximum(radius, half_cell * 0.1),
+            "color": [_rgba(color_map.get(sector, "#9E9E9E")) for sector in cells["dominant_sector"].astype(str)],
+        })
+        layer = pdk.Layer(
+            "ScatterplotLayer",
+            data=data,
+            get_position="[longitude, latitude]",
+            get_radius="radius",
+            get_fill_color="color",
+            pickable=True,
+        )
+        tooltip = {"text": "{count} negocios\nRPS medio: {mean_rps}\nPredominante: {dominant_sector}"}
+
+    return pdk.Deck(
+        initial_view_state=pdk.ViewState(**view),
+        layers=[layer],
+        tooltip=tooltip,
+    )
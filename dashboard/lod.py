@@ -0,0 +1,148 @@
+import altair as alt
+import numpy as np
+import pandas as pd
+
+# Por encima de este número de puntos se envía densidad + muestra
+LOD_MAX_POINTS = 3000
+
+# Rejilla de la densidad (eje x × eje y)
+BINS_X = 60
+BINS_Y = 40
+
+SAMPLE_POINTS = 1500
+TOP_RPS_POINTS = 50
+# Los puntos de celdas con muy pocos negocios se envían siempre (son los atípicos)
+SPARSE_CELL_COUNT = 2
+MAX_SPARSE_POINTS = 500
+RANDOM_STATE = 42
+
+# Barras máximas de los histogramas calculados en el servidor
+HISTOGRAM_BINS = 50
+
+def _field(channel):
+    # "stars_avg:Q" -> "stars_avg"
+    return channel.shorthand.split(":")[0]
+
+def _cells(x, y, n_x=BINS_X, n_y=BINS_Y):
+    """
+    Celda de la rejilla de cada punto y bordes de la rejilla. El eje y es la
+    valoración (1-5); el x se ajusta al rango de los datos.
+    """
+    x_edges = np.linspace(np.nanmin(x), np.nanmax(x) + 1e-9, n_x + 1)
+    y_edges = np.linspace(1.0, 5.0 + 1e-9, n_y + 1)
+    ix = np.clip(np.searchsorted(x_edges, x, side="right") - 1, 0, n_x - 1)
+    iy = np.clip(np.searchsorted(y_edges, y, side="right") - 1, 0, n_y - 1)
+    return ix * n_y + iy, x_edges, y_edges
+
+def density_bins(data: pd.DataFrame, x_field, y_field, color_field):
+    """
+    Densidad 2D en el servidor: número de negocios por celda y categoría de
+    color dominante en cada celda.
+    """
+    x = data[x_field].to_numpy(dtype="float64")
+    y = data[y_field].to_numpy(dtype="float64")
+    cells, x_edges, y_edges = _cells(x, y)
+
+    codes, labels = pd.factorize(data[color_field].astype(str), sort=True)
+    n_labels = max(len(labels), 1)
+    counts = np.bincount(cells * n_labels + codes, minlength=BINS_X * BINS_Y * n_labels)
+    counts = counts.reshape(BINS_X * BINS_Y, n_labels)
+
+    totals = counts.sum(axis=1)
+    occupied = np.flatnonzero(totals)
+    ix, iy = occupied // BINS_Y, occupied % BINS_Y
+    return pd.DataFrame({
+        x_field: x_edges[ix],
+        f"{x_field}_end": x_edges[ix + 1],
+        y_field: y_edges[iy],
+        f"{y_field}_end": y_edges[iy + 1],
+        color_field: np.asarray(labels)[counts[occupied].argmax(axis=1)],
+        "count": totals[occupied],
+    }), cells, totals
+
+def stratified_sample(data: pd.DataFrame, color_field, cells, cell_totals):
+    """
+    Muestra de puntos que conserva la proporción de cada categoría de color,
+    más los negocios con mayor RPS y los de celdas casi vacías (atípicos).
+    """
+    rng = np.random.default_rng(RANDOM_STATE)
+    positions = np.arange(len(data))
+
+    keep = []
+    groups = pd.Series(positions).groupby(data[color_field].astype(str).to_numpy())
+    for _, group in groups:
+        quota = int(np.ceil(SAMPLE_POINTS * len(group) / len(data)))
+        keep.append(rng.choice(group.to_numpy(), size=min(quota, len(group)), replace=False))
+
+    if "review_power_score" in data.columns:
+        scores = data["review_power_score"].to_numpy(dtype="float64")
+        keep.append(np.argsort(-scores, kind="stable")[:TOP_RPS_POINTS])
+
+    sparse = positions[cell_totals[cells] <= SPARSE_CELL_COUNT]
+    keep.append(sparse[:MAX_SPARSE_POINTS])
+
+    return data.iloc[np.unique(np.concatenate(keep))]
+
+def nice_step(span, max_bins):
+    """
+    Ancho de barra "redondo" (1, 2 o 5 por una potencia de 10), el menor que
+    deja como mucho max_bins barras, igual que el binning de Altair.
+    """
+    if not np.isfinite(span) or span <= 0:
+        return 1.0
+    base = 10.0 ** np.floor(np.log10(span / max_bins))
+    for factor in (1, 2, 5, 10):
+        if span / (base * factor) <= max_bins:
+            return float(base * factor)
+    return float(base * 10)
+
+def histogram(values, field, max_bins=HISTOGRAM_BINS):
+    """
+    Histograma calculado en el servidor: una fila por barra ocupada con sus
+    bordes (field, field_end) y el número de negocios. El gráfico recibe
+    solo estas filas, no una por negocio.
+    """
+    values = np.asarray(values, dtype="float64")
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return pd.DataFrame({field: [], f"{field}_end": [], "count": []})
+    step = nice_step(values.max() - values.min(), max_bins)
+    start = np.floor(values.min() / step) * step
+    bins = np.floor((values - start) / step).astype("int64")
+    counts = np.bincount(bins)
+    occupied = np.flatnonzero(counts)
+    return pd.DataFrame({
+        field: start + occupied * step,
+        f"{field}_end": start + (occupied + 1) * step,
+        "count": counts[occupied],
+    })
+
+def lod_scatter(data: pd.DataFrame, x, y, color, tooltip, max_points=LOD_MAX_POINTS):
+    """
+    Gráfico de dispersión con nivel de detalle: con pocos puntos se envían
+    todos; con más de max_points se envía una densidad 2D (coloreada por la
+    categoría dominante) y encima una muestra estratificada con los atípicos
+    y el top de RPS. Solo se envían las columnas que usa el gráfico.
+    """
+    x_field, y_field, color_field = _field(x), _field(y), _field(color)
+    columns = list(dict.fromkeys([x_field, y_field, color_field] + [_field(t) for t in tooltip]))
+    points = data[columns]
+
+    if len(points) <= max_points:
+        return alt.Chart(points).mark_circle(size=60, opacity=0.7).encode(x=x, y=y, color=color, tooltip=tooltip)
+
+    bins, cells, cell_totals = density_bins(points, x_field, y_field, color_field)
+    density = alt.Chart(bins).mark_rect(opacity=0.35).encode(
+        x=x,
+        x2=alt.X2(f"{x_field}_end"),
+        y=y,
+        y2=alt.Y2(f"{y_field}_end"),
+        color=color,
+        tooltip=[
+            alt.Tooltip("count:Q", title="Negocios en la celda"),
+            alt.Tooltip(f"{color_field}:N", title="Predominante"),
+        ],
+    )
+    sample = stratified_sample(points, color_field, cells, cell_totals)
+    sampled = alt.Chart(sample).mark_circle(size=40, opacity=0.8).encode(x=x, y=y, color=color, tooltip=tooltip)
+    return alt.layer(density, sampled)
@@ -0,0 +1,81 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from etl.categories import category_rows
+
+QUERY_CACHE_SIZE = 256
+TOP_N = 10
+
+def _frozen(rows):
+    # Los resultados se comparten entre sesiones: se marcan como solo lectura
+    rows = np.asarray(rows, dtype=np.int64)
+    rows.flags.writeable = False
+    return rows
+
+def build_filter_index(df: pd.DataFrame):
+    """
+    Posiciones de fila (ordenadas) por estado y por (estado, ciudad), para
+    combinar filtros intersectando índices en lugar de copiar el DataFrame.
+    """
+    state_rows = {
+        state: _frozen(rows)
+        for state, rows in df.groupby("state", observed=True, sort=False).indices.items()
+    }
+    city_rows = {
+        key: _frozen(rows)
+        for key, rows in df.groupby(["state", "city"], observed=True, sort=False).indices.items()
+    }
+    cities = {}
+    for state, city in city_rows:
+        cities.setdefault(state, []).append(city)
+    return {
+        "all": _frozen(np.arange(len(df))),
+        "states": sorted(state_rows),
+        "cities": {state: sorted(names) for state, names in cities.items()},
+        "state_rows": state_rows,
+        "city_rows": city_rows,
+    }
+
+def top_rows(rows, scores, n=TOP_N):
+    """
+    Las n filas con mayor puntuación, ordenadas de mayor a menor. argpartition
+    evita ordenar el conjunto completo.
+    """
+    if len(rows) > n:
+        rows = rows[np.argpartition(-scores[rows], n - 1)[:n]]
+    return rows[np.argsort(-scores[rows], kind="stable")]
+
+def make_query(df: pd.DataFrame, filter_index, category_lookup, topk=None, maxsize=QUERY_CACHE_SIZE):
+    """
+    Devuelve una función query(state, city, category) con caché LRU que
+    resuelve la combinación de filtros a posiciones de fila y precalcula sus
+    agregados (conteo por sector y top 10 por RPS). El top 10 se toma de las
+    listas materializadas en el ETL (topk) cuando la combinación existe; si
+    no, se calcula con argpartition.
+    """
+    topk = topk or {}
+    sectors = df["sector"]
+    scores = df["review_power_score"].to_numpy(dtype="float64")
+
+    @lru_cache(maxsize=maxsize)
+    def query(state="Todos", city="Todas", category="Todas"):
+        key = (state, city, category)
+        if state == "Todos":
+            rows = filter_index["all"]
+        elif city == "Todas":
+            rows = filter_index["state_rows"].get(state, filter_index["all"][:0])
+        else:
+            rows = filter_index["city_rows"].get((state, city), filter_index["all"][:0])
+
+        if category != "Todas":
+            rows = np.intersect1d(rows, category_rows(category_lookup, category), assume_unique=True)
+
+        return {
+            "rows": _frozen(rows),
+            "sector_counts": sectors.iloc[rows].value_counts(),
+            "top": _frozen(topk[key][:TOP_N] if key in topk else top_rows(rows, scores)),
+        }
+
+    return query
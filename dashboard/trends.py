@@ -0,0 +1,98 @@
+import os
+
+import altair as alt
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Ventana móvil en meses (la misma que TREND_WINDOW del ETL)
+WINDOW = int(os.environ.get("TREND_WINDOW", 12))
+
+def cube_index(table: pa.Table, business_ids):
+    """
+    Prepara el cubo (negocio × mes) para consultas del dashboard: cada bucket
+    se asocia a la fila del negocio en el dataset y se ordena por fila. El
+    cruce por business_id se hace en Arrow, sin convertir los ids a objetos
+    de Python. Los buckets de negocios que no están en el dataset se descartan.
+    """
+    row = pc.index_in(table["business_id"], value_set=pa.array(business_ids, type=pa.string()))
+    row = pc.fill_null(row, -1).to_numpy()
+    # Meses desde 1970 como enteros
+    month = table["month"].to_numpy().astype("datetime64[M]").astype("int64")
+    n = table["n"].to_numpy()
+    stars_sum = table["stars_sum"].to_numpy()
+
+    keep = np.flatnonzero(row >= 0)
+    order = keep[np.argsort(row[keep], kind="stable")]
+    return {
+        "row": row[order].astype("int32"),
+        "month": month[order].astype("int32"),
+        "n": n[order].astype("int32"),
+        "stars_sum": stars_sum[order].astype("float32"),
+        "last_month": int(month.max()) if len(month) else 0,
+        "rows": int(len(business_ids)),
+    }
+
+def _select(cube, rows):
+    # Un negocio: búsqueda binaria en las filas ordenadas; varios: máscara por fila
+    if len(rows) == 1:
+        lo, hi = np.searchsorted(cube["row"], [rows[0], rows[0] + 1])
+        return slice(lo, hi)
+    mask = np.zeros(cube["rows"], dtype=bool)
+    mask[rows] = True
+    return mask[cube["row"]]
+
+def monthly_trend(cube, rows, window=WINDOW) -> pd.DataFrame:
+    """
+    Serie mensual de las filas seleccionadas (un negocio o un filtro) desde
+    su primer mes con reviews hasta el último mes del cubo:
+      - reviews y stars_avg del mes
+      - reviews_12m y stars_12m: suma y media móviles de los últimos meses
+    """
+    selected = _select(cube, np.asarray(rows))
+    months = cube["month"][selected]
+    if len(months) == 0:
+        return pd.DataFrame(columns=["month", "reviews", "stars_avg", "reviews_12m", "stars_12m"])
+
+    first = int(months.min())
+    size = cube["last_month"] - first + 1
+    offset = months - first
+    reviews = np.bincount(offset, weights=cube["n"][selected], minlength=size)
+    stars = np.bincount(offset, weights=cube["stars_sum"][selected], minlength=size)
+
+    # Sumas móviles con la suma acumulada
+    def rolling(values):
+        total = np.cumsum(values)
+        total[window:] -= total[:-window].copy()
+        return total
+
+    reviews_12m = rolling(reviews)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return pd.DataFrame({
+            "month": (np.arange(size) + first).astype("datetime64[M]").astype("datetime64[ns]"),
+            "reviews": reviews.astype("int64"),
+            "stars_avg": np.where(reviews > 0, stars / reviews, np.nan),
+            "reviews_12m": reviews_12m.astype("int64"),
+            "stars_12m": np.where(reviews_12m > 0, rolling(stars) / reviews_12m, np.nan),
+        })
+
+def trend_chart(series: pd.DataFrame):
+    """
+    Reviews por mes (barras) y valoración media móvil de los últimos meses
+    (línea), cada una con su eje.
+    """
+    base = alt.Chart(series).encode(x=alt.X("month:T", title="Mes"))
+    bars = base.mark_bar(color="#90CAF9").encode(
+        y=alt.Y("reviews:Q", title="Reseñas por mes"),
+        tooltip=[
+            alt.Tooltip("month:T", title="Mes", format="%Y-%m"),
+            alt.Tooltip("reviews:Q", title="Reseñas"),
+            alt.Tooltip("stars_avg:Q", title="Valoración del mes", format=".2f"),
+            alt.Tooltip("stars_12m:Q", title=f"Valoración {WINDOW} meses", format=".2f"),
+        ],
+    )
+    line = base.mark_line(color="#E53935", interpolate="monotone").encode(
+        y=alt.Y("stars_12m:Q", title=f"Valoración media ({WINDOW} meses)", scale=alt.Scale(domain=[1, 5])),
+    )
+    return alt.layer(bars, line).resolve_scale(y="independent")
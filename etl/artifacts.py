@@ -0,0 +1,81 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+ARTIFACTS_PATH = "data"
+
+# Tipos de las columnas en los artefactos entre etapas
+CATEGORICAL_COLUMNS = ["city", "state", "sector", "cluster_label", "primary_category"]
+FLOAT64_COLUMNS = ["longitude", "latitude"]
+
+def artifact_path(name):
+    return os.path.join(ARTIFACTS_PATH, f"{name}.arrow")
+
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Tipos compactos para los artefactos:
+      - city/state (y las etiquetas de segmento y cluster) como categóricas
+      - métricas en float32 (las coordenadas se mantienen en float64)
+      - contadores como int32 si caben (int64 en caso contrario)
+    """
+    df = df.copy()
+    for col in df.columns:
+        if col in CATEGORICAL_COLUMNS:
+            df[col] = df[col].astype("category")
+        elif col in FLOAT64_COLUMNS:
+            continue
+        elif pd.api.types.is_float_dtype(df[col]):
+            df[col] = df[col].astype("float32")
+        elif pd.api.types.is_integer_dtype(df[col]):
+            info = np.iinfo(np.int32)
+            if df[col].empty or (df[col].min() >= info.min and df[col].max() <= info.max):
+                df[col] = df[col].astype("int32")
+    return df
+
+def write_artifact(df: pd.DataFrame, name):
+    """
+    Guarda la salida de una etapa como fichero Arrow IPC sin compresión, de
+    modo que las etapas siguientes y el dashboard lo pueden mapear en memoria
+    sin copiarlo ni parsearlo.
+    """
+    os.makedirs(ARTIFACTS_PATH, exist_ok=True)
+    table = pa.Table.from_pandas(compact_dtypes(df), preserve_index=False)
+    path = artifact_path(name)
+    tmp_path = path + ".tmp"
+    with pa.OSFile(tmp_path, "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+    return path
+
+def read_table(name, columns=None) -> pa.Table:
+    """
+    Mapea en memoria el artefacto y devuelve la tabla de Arrow sin copiarla.
+    """
+    source = pa.memory_map(artifact_path(name), "r")
+    table = ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select(columns)
+    return table
+
+def read_artifact(name, columns=None) -> pd.DataFrame:
+    # split_blocks evita consolidar columnas, así las numéricas no se copian
+    return read_table(name, columns).to_pandas(split_blocks=True)
+
+def export_csv(name, path=None):
+    """
+    Exporta un artefacto a CSV (solo para compartir o inspeccionar los datos;
+    las etapas del pipeline no leen CSV).
+    """
+    path = path or os.path.join(ARTIFACTS_PATH, f"{name}.csv")
+    read_artifact(name).to_csv(path, index=False)
+    print(f"📤 {name} exportado a {path}")
+    return path
+
+if __name__ == "__main__":
+    # python -m etl.artifacts business_clustered [...]
+    for artifact in sys.argv[1:]:
+        export_csv(artifact)
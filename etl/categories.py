@@ -0,0 +1,95 @@
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from etl.artifacts import ARTIFACTS_PATH, read_artifact
+from etl.profiling import profile, profile_run
+
+INDEX_PATH = os.path.join(ARTIFACTS_PATH, "category_index.npz")
+
+def split_categories(categories: pd.Series) -> pd.Series:
+    """
+    Separa la cadena "A, B, C" de cada negocio en categorías individuales.
+    Devuelve una serie larga indexada por la posición del negocio.
+    """
+    exploded = categories.reset_index(drop=True).fillna("").str.split(",").explode().str.strip()
+    return exploded[exploded != ""]
+
+def build_category_index(categories: pd.Series):
+    """
+    Construye el vocabulario de categorías (ordenado) y la matriz dispersa
+    negocio × categoría en formato CSR, alineada con el orden de las filas.
+    """
+    exploded = split_categories(categories)
+    codes, vocab = pd.factorize(exploded, sort=True)
+    rows = exploded.index.to_numpy()
+    membership = sparse.csr_matrix(
+        (np.ones(len(codes), dtype=bool), (rows, codes)),
+        shape=(len(categories), len(vocab)),
+    )
+    # Una categoría repetida en el mismo negocio cuenta una sola vez
+    membership.sum_duplicates()
+    return {"vocab": np.asarray(vocab, dtype=str), "membership": membership}
+
+def save_category_index(index, path=INDEX_PATH):
+    membership = index["membership"]
+    np.savez(
+        path,
+        vocab=index["vocab"],
+        indptr=membership.indptr,
+        indices=membership.indices,
+        shape=np.array(membership.shape),
+    )
+
+def load_category_index(path=INDEX_PATH):
+    with np.load(path) as data:
+        indices = data["indices"]
+        membership = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=bool), indices, data["indptr"]),
+            shape=tuple(data["shape"]),
+        )
+        return {"vocab": data["vocab"], "membership": membership}
+
+def prepare_lookup(index):
+    """
+    Estructuras de consulta del índice: código de cada categoría,
+    matriz por negocio (CSR) y por categoría (CSC).
+    """
+    membership = index["membership"]
+    return {
+        "vocab": index["vocab"],
+        "codes": {name: code for code, name in enumerate(index["vocab"])},
+        "by_business": membership.tocsr(),
+        "by_category": membership.tocsc(),
+    }
+
+def category_options(lookup, rows=None):
+    """
+    Categorías presentes en las filas dadas (todas si rows es None), por
+    búsqueda en la matriz en lugar de recorrer las cadenas de texto.
+    """
+    matrix = lookup["by_business"] if rows is None else lookup["by_business"][rows]
+    return lookup["vocab"][np.unique(matrix.indices)].tolist()
+
+def category_rows(lookup, category):
+    """
+    Posiciones de los negocios que tienen exactamente esa categoría
+    ("Bars" no coincide con "Juice Bars").
+    """
+    code = lookup["codes"].get(category)
+    if code is None:
+        return np.empty(0, dtype=np.int64)
+    by_category = lookup["by_category"]
+    return by_category.indices[by_category.indptr[code]:by_category.indptr[code + 1]]
+
+if __name__ == "__main__":
+    with profile_run("categories"):
+        df = read_artifact("business_clustered", ["categories"])
+        with profile("build_category_index", rows_in=len(df)) as section:
+            index = build_category_index(df["categories"])
+            section["rows_out"] = len(index["vocab"])
+        with profile("save_category_index"):
+            save_category_index(index)
+    print(f"✅ Índice de {len(index['vocab'])} categorías guardado en {INDEX_PATH}")
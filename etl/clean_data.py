@@ -1,88 +1,166 @@
-from pymongo import MongoClient
+import os
 import pandas as pd
-
-client = MongoClient("mongodb://mongo:27017/")
-db = client["yelp"]
+import pyarrow as pa
+
+from etl.artifacts import write_artifact
+from etl.columnar import aggregate_frame, find_frame
+from etl.db import get_db
+from etl.load_data import read_changed_business_ids
+from etl.profiling import explain_stats, profile, profile_run
+
+db = get_db()
+
+# Esquemas de columnas (y proyecciones) de cada lectura desde Mongo
+BUSINESS_SCHEMA = {
+    "business_id": pa.string(), "name": pa.string(), "city": pa.string(), "state": pa.string(),
+    "longitude": pa.float64(), "latitude": pa.float64(), "categories": pa.string(),
+    "stars": pa.float64(), "review_count": pa.int64(),
+}
+REVIEW_AGG_SCHEMA = {
+    "business_id": pa.string(), "stars_avg": pa.float64(), "review_count_sum": pa.int64(),
+}
 
 def normalize_city(city):
     if not isinstance(city, str):
         return ""
     return city.strip().replace(",", "").lower().title()
 
+def review_collection():
+    """
+    Colección de reviews a agregar: la proyección compacta (review_compact)
+    si el loader la ha generado, o la colección completa en caso contrario.
+    """
+    if db.review_compact.estimated_document_count() > 0:
+        return db.review_compact
+    return db.review
+
 def aggregate_reviews_from_mongo() -> pd.DataFrame:
     """
-    Agrega métricas por business_id desde la colección db.review:
+    Agrega métricas por business_id desde la colección de reviews:
       - stars_avg: promedio de estrellas por negocio
       - review_count: total de reviews por negocio
-      - useful_sum, funny_sum, cool_sum: suma de votos por negocio
     """
     pipeline = [
         {"$match": {"business_id": {"$ne": None}, "stars": {"$ne": None}}},
         {"$group": {
             "_id": "$business_id",
             "stars_sum": {"$sum": "$stars"},
-            "stars_count": {"$sum": 1},
             "review_count": {"$sum": 1},
         }},
         {"$project": {
             "business_id": "$_id",
             "_id": 0,
-            "stars_avg": {"$round": [{"$divide": ["$stars_sum", "$stars_count"]}, 3]},
+            "stars_avg": {"$round": [{"$divide": ["$stars_sum", "$review_count"]}, 3]},
             "review_count_sum": "$review_count",
         }}
     ]
-    agg = list(db.review.aggregate(pipeline))
-
-    return pd.DataFrame(agg)
+    return aggregate_frame(review_collection(), pipeline, REVIEW_AGG_SCHEMA, allowDiskUse=True)
 
 def load_business_from_mongo() -> pd.DataFrame:
     """
     Carga negocios base desde db.business.
     """
-    cursor = db.business.find(
-        {"review_count": {"$gt": 0}, "is_open": 1},
-        {
-            "business_id": 1, "name": 1, "city": 1, "state": 1,
-            "longitude": 1, "latitude": 1, "categories": 1,
-            "stars": 1, "review_count": 1
-        }
-    )
-    df = pd.DataFrame(list(cursor))
+    df = find_frame(db.business, {"review_count": {"$gt": 0}, "is_open": 1}, BUSINESS_SCHEMA)
 
     if not df.empty:
         df.dropna(subset=["business_id"], inplace=True)
     return df
 
-def build_reviews_business_csv():
-    business_df = load_business_from_mongo()
-    reviews_df = aggregate_reviews_from_mongo()
+MIN_REVIEWS = 10
+BUSINESS_STATS_COLLECTION = "business_stats"
 
-    # Fusiona y actualiza campos desde reviews
-    merged_df = business_df.merge(reviews_df, on="business_id", how="left")
+COLS_KEEP = [
+    "business_id", "name", "city", "state", "longitude", "latitude", "categories", "stars", "stars_avg", "review_count"
+]
+BUSINESS_STATS_SCHEMA = {col: BUSINESS_SCHEMA.get(col, pa.float64()) for col in COLS_KEEP}
 
-    # Actualiza review_count con agregados
-    merged_df["review_count"] = merged_df["review_count_sum"].fillna(merged_df["review_count"])
-
-    # Filtra por mínimo de reviews
-    merged_df = merged_df[merged_df["review_count"] >= 10]
-
-    cols_keep = [
-        "business_id", "name", "city", "state", "longitude", "latitude", "categories", "stars", "stars_avg", "review_count"
+def business_stats_pipeline(business_ids=None):
+    """
+    Pipeline que construye business_stats en el servidor:
+      - filtra negocios abiertos con reviews
+      - $lookup contra las reviews agrupadas del negocio (usa el índice business_id)
+      - actualiza review_count con el agregado y filtra por MIN_REVIEWS
+      - escribe el resultado con $merge (la ciudad se normaliza al leerlo,
+        ver build_reviews_business_csv)
+    """
+    match = {"review_count": {"$gt": 0}, "is_open": 1, "business_id": {"$ne": None}}
+    if business_ids is not None:
+        match["business_id"] = {"$in": list(business_ids)}
+
+    return [
+        {"$match": match},
+        {"$lookup": {
+            "from": review_collection().name,
+            "localField": "business_id",
+            "foreignField": "business_id",
+            "pipeline": [
+                {"$match": {"stars": {"$ne": None}}},
+                {"$group": {"_id": None, "stars_sum": {"$sum": "$stars"}, "review_count": {"$sum": 1}}},
+            ],
+            "as": "reviews",
+        }},
+        {"$unwind": {"path": "$reviews", "preserveNullAndEmptyArrays": True}},
+        {"$set": {
+            "stars_avg": {"$round": [{"$divide": ["$reviews.stars_sum", "$reviews.review_count"]}, 3]},
+            "review_count": {"$ifNull": ["$reviews.review_count", "$review_count"]},
+        }},
+        {"$match": {"review_count": {"$gte": MIN_REVIEWS}}},
+        {"$project": {
+            "_id": "$business_id",
+            **{col: 1 for col in COLS_KEEP if col != "city"},
+            # La ciudad se guarda tal cual (solo texto) y se normaliza al leer
+            "city": {"$cond": [{"$eq": [{"$type": "$city"}, "string"]}, "$city", ""]},
+        }},
+        {"$merge": {"into": BUSINESS_STATS_COLLECTION, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
     ]
-    merged_df = merged_df[cols_keep]
-    merged_df["city"] = merged_df["city"].apply(normalize_city)
 
+def build_business_stats(business_ids=None):
+    """
+    Materializa la colección business_stats. Sin business_ids se reconstruye
+    entera; con una lista solo se recalculan esos negocios (p. ej. los
+    afectados por una carga incremental).
+    """
+    with profile("business_stats") as section:
+        if business_ids is None:
+            db[BUSINESS_STATS_COLLECTION].drop()
+        else:
+            # Los negocios que ya no cumplan los filtros deben desaparecer
+            db[BUSINESS_STATS_COLLECTION].delete_many({"_id": {"$in": list(business_ids)}})
+        pipeline = business_stats_pipeline(business_ids)
+        explain_stats(db, "business", pipeline)
+        db.business.aggregate(pipeline, allowDiskUse=True)
+        section["rows_out"] = db[BUSINESS_STATS_COLLECTION].estimated_document_count()
+
+def build_reviews_business_csv(business_ids=None):
+    """
+    Actualiza business_stats (entera, o solo business_ids si la colección ya
+    existe) y lee todas sus filas para el artefacto.
+    """
+    if business_ids is not None and BUSINESS_STATS_COLLECTION in db.list_collection_names():
+        print(f"🔄 Recalculando {len(business_ids)} negocios afectados por la carga incremental")
+        build_business_stats(business_ids)
+    else:
+        build_business_stats()
+
+    # Solo se leen las filas finales, ya filtradas. La ciudad se normaliza
+    # aquí con str.title(), que también pone en mayúscula las letras no ASCII
+    # ("MONTRÉAL" -> "Montréal"); $toUpper/$toLower de Mongo solo cambian ASCII
+    with profile("read_business_stats") as section:
+        merged_df = find_frame(db[BUSINESS_STATS_COLLECTION], {}, BUSINESS_STATS_SCHEMA)
+        merged_df["city"] = merged_df["city"].map(normalize_city)
+        section["rows_out"] = len(merged_df)
 
     print(f"Total de registros cargados: {len(merged_df)}")
-    merged_df.dropna()
-
-    # Normaliza ciudad y categorías
 
     return merged_df
 
 if __name__ == "__main__":
 
-    df = build_reviews_business_csv()
-    df.to_csv("data/reviews_business.csv", index=False)
+    with profile_run("clean_data"):
+        # LOAD_MODE=delta: solo los negocios que ha tocado la carga incremental
+        business_ids = read_changed_business_ids() if os.environ.get("LOAD_MODE", "full") == "delta" else None
+        df = build_reviews_business_csv(business_ids)
+        with profile("write_artifact", rows_in=len(df)):
+            write_artifact(df, "reviews_business")
 
     print("✅ Datos limpios guardados")
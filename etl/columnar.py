@@ -0,0 +1,83 @@
+from itertools import islice
+
+import pandas as pd
+import pyarrow as pa
+
+BATCH_SIZE = 10000
+
+def projection(schema):
+    """
+    Proyección de Mongo derivada del esquema: solo se piden sus columnas.
+    """
+    return {col: 1 for col in schema} | {"_id": 0}
+
+def cursor_batches(cursor, schema, batch_size=BATCH_SIZE):
+    """
+    Recorre un cursor de Mongo por lotes de tamaño fijo y devuelve cada lote
+    como un RecordBatch de Arrow con una columna tipada por campo del esquema.
+    Un tipo None deja que Arrow lo infiera a partir del lote.
+    """
+    while True:
+        batch = list(islice(cursor, batch_size))
+        if not batch:
+            break
+        yield pa.record_batch({
+            col: pa.array([doc.get(col) for doc in batch], type=pa_type)
+            for col, pa_type in schema.items()
+        })
+
+def cursor_to_table(cursor, schema, batch_size=BATCH_SIZE) -> pa.Table:
+    """
+    Lee un cursor de Mongo por lotes de tamaño fijo y vuelca cada lote en
+    arrays tipados de Arrow (uno por columna del esquema). Solo hay un lote
+    de diccionarios vivo a la vez, así que el pico de memoria queda cerca del
+    tamaño de los datos en columnas.
+
+    schema: diccionario {columna: tipo de Arrow}, p. ej. {"stars": pa.float64()}
+    """
+    chunks = {col: [] for col in schema}
+    for batch in cursor_batches(cursor, schema, batch_size):
+        for col in schema:
+            chunks[col].append(batch.column(col))
+
+    return pa.table({
+        col: pa.chunked_array(arrays, type=schema[col])
+        for col, arrays in chunks.items()
+    })
+
+def cursor_to_frame(cursor, schema, batch_size=BATCH_SIZE) -> pd.DataFrame:
+    """
+    Igual que cursor_to_table, pero devuelve un DataFrame de pandas.
+    """
+    return cursor_to_table(cursor, schema, batch_size).to_pandas()
+
+def find_frame(collection, query, schema, batch_size=BATCH_SIZE) -> pd.DataFrame:
+    cursor = collection.find(query, projection(schema), batch_size=batch_size)
+    return cursor_to_frame(cursor, schema, batch_size)
+
+def aggregate_frame(collection, pipeline, schema, batch_size=BATCH_SIZE, **kwargs) -> pd.DataFrame:
+    cursor = collection.aggregate(pipeline, batchSize=batch_size, **kwargs)
+    return cursor_to_frame(cursor, schema, batch_size)
+
+def id_ranges(collection, parts):
+    """
+    Divide la colección en rangos de _id de tamaño parecido a partir de una
+    muestra aleatoria, para que cada proceso recorra su rango por el índice.
+    """
+    if parts <= 1:
+        return [(None, None)]
+    sample = collection.aggregate([{"$sample": {"size": parts * 100}}, {"$project": {"_id": 1}}])
+    ids = sorted({doc["_id"] for doc in sample})
+    if len(ids) < parts:
+        return [(None, None)]
+    bounds = [ids[i * len(ids) // parts] for i in range(1, parts)]
+    return list(zip([None] + bounds, bounds + [None]))
+
+def range_query(lo, hi):
+    # Filtro de un rango [lo, hi) de _id; None deja el extremo abierto
+    query = {}
+    if lo is not None:
+        query["$gte"] = lo
+    if hi is not None:
+        query["$lt"] = hi
+    return {"_id": query} if query else {}
@@ -0,0 +1,194 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from etl.artifacts import write_artifact
+from etl.clean_data import review_collection
+from etl.columnar import aggregate_frame
+from etl.db import get_db
+from etl.load_data import CHANGED_BUCKETS_PATH
+from etl.profiling import explain_stats, profile, profile_run
+
+db = get_db()
+
+# Cubo (negocio × mes) con el número de reviews y la suma de estrellas
+CUBE_COLLECTION = "review_cube"
+CUBE_SCHEMA = {"business_id": pa.string(), "month": pa.string(), "n": pa.int64(), "stars_sum": pa.float64()}
+# Negocios por aggregate al recalcular buckets (acota el tamaño de los $in)
+BUCKET_BATCH = 5000
+
+# Ventana del RPS reciente y de la tendencia, en meses hasta el último mes del cubo
+TREND_WINDOW = int(os.environ.get("TREND_WINDOW", 12))
+TREND_MONTHS = int(os.environ.get("TREND_MONTHS", 24))
+# Meses con reviews necesarios para estimar la pendiente
+MIN_TREND_MONTHS = 3
+
+def month_expr(field="$date"):
+    # Mes "YYYY-MM": la fecha es texto en la colección completa y date en la compacta
+    return {"$cond": [
+        {"$eq": [{"$type": field}, "string"]},
+        {"$substrBytes": [field, 0, 7]},
+        {"$dateToString": {"format": "%Y-%m", "date": field}},
+    ]}
+
+def cube_pipeline(business_ids=None, buckets=None):
+    """
+    Pipeline que agrega las reviews por (business_id, mes) y escribe los
+    buckets con $merge. Con business_ids solo se leen las reviews de esos
+    negocios (índice business_id) y con buckets solo se escriben esos buckets.
+    """
+    match = {"business_id": {"$ne": None}, "stars": {"$ne": None}, "date": {"$ne": None}}
+    if business_ids is not None:
+        match["business_id"] = {"$in": list(business_ids)}
+
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {"business_id": "$business_id", "month": month_expr()},
+            "n": {"$sum": 1},
+            "stars_sum": {"$sum": "$stars"},
+        }},
+    ]
+    if buckets is not None:
+        pipeline.append({"$match": {"_id": {"$in": [
+            {"business_id": business_id, "month": month} for business_id, month in buckets
+        ]}}})
+    pipeline.append(
+        {"$merge": {"into": CUBE_COLLECTION, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+    )
+    return pipeline
+
+def build_cube():
+    """
+    Reconstruye el cubo entero con una pasada sobre las reviews.
+    """
+    with profile("build_cube") as section:
+        db[CUBE_COLLECTION].drop()
+        collection = review_collection()
+        pipeline = cube_pipeline()
+        explain_stats(db, collection.name, pipeline)
+        collection.aggregate(pipeline, allowDiskUse=True)
+        section["rows_out"] = db[CUBE_COLLECTION].estimated_document_count()
+
+def update_buckets(buckets, batch=BUCKET_BATCH):
+    """
+    Recalcula solo los buckets (business_id, mes) afectados por una carga
+    incremental: se borran y se vuelven a agregar desde las reviews de esos
+    negocios. Un bucket que se queda sin reviews (una review que cambió de
+    fecha) desaparece. El resto del cubo no se toca.
+    """
+    by_business = {}
+    for business_id, month in buckets:
+        by_business.setdefault(business_id, []).append(month)
+    business_ids = sorted(by_business)
+
+    with profile("update_buckets", rows_in=len(buckets)) as section:
+        collection = review_collection()
+        for i in range(0, len(business_ids), batch):
+            ids = business_ids[i:i + batch]
+            keys = [(business_id, month) for business_id in ids for month in by_business[business_id]]
+            db[CUBE_COLLECTION].delete_many({"_id": {"$in": [
+                {"business_id": business_id, "month": month} for business_id, month in keys
+            ]}})
+            collection.aggregate(cube_pipeline(ids, keys), allowDiskUse=True)
+        section["rows_out"] = db[CUBE_COLLECTION].estimated_document_count()
+
+def read_changed_buckets():
+    if not os.path.exists(CHANGED_BUCKETS_PATH):
+        return None
+    with open(CHANGED_BUCKETS_PATH, encoding="utf-8") as f:
+        return [tuple(bucket) for bucket in json.load(f)]
+
+def read_cube() -> pd.DataFrame:
+    """
+    Lee el cubo como DataFrame (business_id, month, n, stars_sum), con el mes
+    como fecha del primer día, ordenado por negocio y mes.
+    """
+    pipeline = [{"$project": {
+        "_id": 0,
+        "business_id": "$_id.business_id",
+        "month": "$_id.month",
+        "n": 1,
+        "stars_sum": 1,
+    }}]
+    cube = aggregate_frame(db[CUBE_COLLECTION], pipeline, CUBE_SCHEMA)
+    cube["month"] = pd.to_datetime(cube["month"], format="%Y-%m", errors="coerce")
+    cube = cube.dropna(subset=["month"])
+    return cube.sort_values(["business_id", "month"], ignore_index=True)
+
+def month_number(months):
+    # Meses desde el año 0, para restar fechas mensuales como enteros
+    months = pd.DatetimeIndex(months)
+    return np.asarray(months.year * 12 + months.month - 1, dtype="int64")
+
+def business_trends(cube: pd.DataFrame, window=TREND_WINDOW, trend_months=TREND_MONTHS) -> pd.DataFrame:
+    """
+    Métricas recientes por negocio a partir del cubo, relativas al último mes
+    con datos (el dump no llega hasta hoy):
+      - reviews_12m, stars_12m: reviews y media de estrellas en la ventana
+      - trend_slope: pendiente (estrellas por año) de la media mensual en los
+        últimos trend_months, por mínimos cuadrados ponderados por el número
+        de reviews de cada mes; NaN con menos de MIN_TREND_MONTHS meses
+    """
+    if cube.empty:
+        return pd.DataFrame(columns=["business_id", "reviews_12m", "stars_12m", "trend_slope"])
+
+    month = month_number(cube["month"])
+    age = month.max() - month
+    n = cube["n"].to_numpy(dtype="float64")
+    stars_sum = cube["stars_sum"].to_numpy(dtype="float64")
+
+    # Regresión ponderada de la media mensual (stars_sum / n) con peso n:
+    # las sumas necesarias salen directamente de los buckets
+    recent = age < window
+    trend = age < trend_months
+    x = -age.astype("float64")
+    frame = pd.DataFrame({
+        "business_id": cube["business_id"].to_numpy(),
+        "n_recent": np.where(recent, n, 0),
+        "stars_recent": np.where(recent, stars_sum, 0),
+        "w": np.where(trend, n, 0),
+        "wx": np.where(trend, n * x, 0),
+        "wxx": np.where(trend, n * x * x, 0),
+        "wy": np.where(trend, stars_sum, 0),
+        "wxy": np.where(trend, stars_sum * x, 0),
+        "months": trend.astype("int64"),
+    })
+    sums = frame.groupby("business_id", sort=False).sum()
+
+    denominator = sums["w"] * sums["wxx"] - sums["wx"] ** 2
+    slope = (sums["w"] * sums["wxy"] - sums["wx"] * sums["wy"]) / denominator.where(denominator > 0)
+    slope = slope.where(sums["months"] >= MIN_TREND_MONTHS)
+
+    return pd.DataFrame({
+        "business_id": sums.index,
+        "reviews_12m": sums["n_recent"].to_numpy().astype("int64"),
+        "stars_12m": (sums["stars_recent"] / sums["n_recent"].where(sums["n_recent"] > 0)).to_numpy(),
+        "trend_slope": (slope * 12).to_numpy(),
+    })
+
+if __name__ == "__main__":
+    with profile_run("cube"):
+        # LOAD_MODE=delta: solo los buckets que ha tocado la carga incremental
+        buckets = read_changed_buckets() if os.environ.get("LOAD_MODE", "full") == "delta" else None
+        if buckets is not None and CUBE_COLLECTION in db.list_collection_names():
+            update_buckets(buckets)
+            print(f"🔄 {len(buckets)} buckets mensuales recalculados")
+        else:
+            build_cube()
+
+        with profile("read_cube") as section:
+            cube = read_cube()
+            section["rows_out"] = len(cube)
+
+        with profile("trends", rows_in=len(cube)) as section:
+            trends = business_trends(cube)
+            section["rows_out"] = len(trends)
+
+        with profile("write_artifact", rows_in=len(cube)):
+            write_artifact(cube, "review_cube")
+            write_artifact(trends, "review_trends")
+    print(f"✅ Cubo mensual de {len(cube)} buckets y tendencias de {len(trends)} negocios guardados")
@@ -0,0 +1,32 @@
+import os
+
+from pymongo import MongoClient
+
+# El listener de comandos de etl/profiling.py se registra al importarlo y
+# tiene que estar antes de crear el cliente
+import etl.profiling  # noqa: F401
+
+MONGO_URI = os.environ.get("MONGO_URI", "mongodb://mongo:27017/")
+MONGO_DB = os.environ.get("MONGO_DB", "yelp")
+
+_client = None
+
+def get_db():
+    """
+    Base de datos del ETL. El cliente se crea la primera vez que se pide y
+    se comparte en el proceso (MongoClient mantiene su propio pool de
+    conexiones).
+    """
+    global _client
+    if _client is None:
+        _client = MongoClient(MONGO_URI)
+    return _client[MONGO_DB]
+
+def init_worker():
+    """
+    Inicializador de los ProcessPoolExecutor del ETL. Cada proceso abre su
+    propio cliente: MongoClient no es seguro tras un fork, así que se descarta
+    el heredado del proceso principal y get_db() crea uno nuevo.
+    """
+    global _client
+    _client = None
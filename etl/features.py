@@ -1,10 +1,247 @@
-import pandas as pd
+import hashlib
+import inspect
+import json
+import os
+import time
+
 import numpy as np
+import pandas as pd
+
+from etl.artifacts import ARTIFACTS_PATH, artifact_path, read_artifact, write_artifact
+from etl.profiling import profile, profile_run
+from etl.segmentation import segment
+
+CHUNK_ROWS = 1_000_000
+MANIFEST_PATH = os.path.join(ARTIFACTS_PATH, "features_manifest.json")
+
+# Peso (en número de reviews) de la media global en la valoración bayesiana
+BAYES_PRIOR_WEIGHT = 10
+# Media a priori si ningún negocio tiene valoración: el centro de la escala 1-5
+DEFAULT_PRIOR_MEAN = 3.0
+
+# Registro de features: nombre -> {"inputs", "func", "prepare"}
+FEATURES = {}
+
+def feature(inputs, prepare=None):
+    """
+    Registra una feature vectorizada. func recibe un array de NumPy por cada
+    columna de inputs (en el mismo orden) y devuelve un array del mismo tamaño.
+    prepare, opcional, recibe las columnas completas y devuelve parámetros
+    globales (p. ej. una media a priori) que se pasan a func como keywords.
+    """
+    def register(func):
+        FEATURES[func.__name__] = {"inputs": inputs, "func": func, "prepare": prepare}
+        return func
+    return register
+
+def rating_prior(stars_avg, review_count):
+    # Media global de las valoraciones, ponderada por número de reviews
+    # (DEFAULT_PRIOR_MEAN si no hay ninguna valoración con reviews)
+    valid = ~np.isnan(stars_avg) & ~np.isnan(review_count)
+    if review_count[valid].sum() <= 0:
+        return {"prior_mean": DEFAULT_PRIOR_MEAN}
+    return {"prior_mean": float(np.average(stars_avg[valid], weights=review_count[valid]))}
+
+@feature(["stars_avg", "stars", "review_count"])
+def review_power_score(stars_avg, stars, review_count):
+    # RPS sobre la media real de las reviews (la redondeada si no hay agregado)
+    return np.where(np.isnan(stars_avg), stars, stars_avg) * np.log1p(review_count)
+
+@feature(["stars", "review_count"])
+def rps_rounded(stars, review_count):
+    # Variante original del RPS sobre las estrellas redondeadas de Yelp
+    return stars * np.log1p(review_count)
+
+@feature(["review_count"])
+def log_volume(review_count):
+    return np.log1p(review_count)
+
+@feature(["stars_avg", "review_count"], prepare=rating_prior)
+def bayesian_rating(stars_avg, review_count, prior_mean):
+    # Valoración encogida hacia la media global cuando hay pocas reviews
+    stars_avg = np.where(np.isnan(stars_avg), prior_mean, stars_avg)
+    return (BAYES_PRIOR_WEIGHT * prior_mean + review_count * stars_avg) / (BAYES_PRIOR_WEIGHT + review_count)
+
+@feature(["stars_avg", "review_count"], prepare=rating_prior)
+def rps_bayesian(stars_avg, review_count, prior_mean):
+    return bayesian_rating(stars_avg, review_count, prior_mean) * np.log1p(review_count)
+
+@feature(["stars_mean", "stars_std", "review_count"])
+def rps_consistency(stars_mean, stars_std, review_count):
+    # RPS penalizado por la dispersión de las valoraciones
+    return stars_mean * np.log1p(review_count) / (1 + np.nan_to_num(stars_std))
+
+def credibility_scale(credibility_stars, effective_reviews, review_count):
+    # Peso medio de un revisor en todo el dataset, para expresar las reviews
+    # efectivas en la misma escala que review_count. Sin reviews efectivas
+    # el peso es 1 (las reviews efectivas se usan tal cual)
+    valid = ~np.isnan(effective_reviews)
+    mean_weight = float(effective_reviews[valid].sum() / max(review_count[valid].sum(), 1))
+    return {"mean_weight": mean_weight if mean_weight > 0 else 1.0}
+
+@feature(["credibility_stars", "effective_reviews", "review_count"], prepare=credibility_scale)
+def rps_credibility(credibility_stars, effective_reviews, review_count, mean_weight):
+    # RPS con cada review ponderada por la credibilidad de su autor (etl/credibility.py)
+    return credibility_stars * np.log1p(effective_reviews / mean_weight)
+
+@feature(["stars_12m", "reviews_12m"])
+def rps_12m(stars_12m, reviews_12m):
+    # RPS de los últimos 12 meses del cubo mensual (etl/cube.py); 0 sin reviews recientes
+    return np.nan_to_num(stars_12m) * np.log1p(np.nan_to_num(reviews_12m))
+
+def _code_parts(func, seen):
+    """
+    Código de una función y de todo lo que usa de su módulo: funciones
+    auxiliares (recursivamente) y constantes como BAYES_PRIOR_WEIGHT. Los
+    módulos importados (np, pd) no forman parte de la huella.
+    """
+    if func in seen:
+        return []
+    seen.add(func)
+    parts = [inspect.getsource(func)]
+    names, pending = set(), [func.__code__]
+    while pending:
+        code = pending.pop()
+        names.update(code.co_names)
+        pending.extend(const for const in code.co_consts if inspect.iscode(const))
+    for name in sorted(names):
+        if name not in func.__globals__:
+            continue
+        value = func.__globals__[name]
+        if inspect.isfunction(value):
+            parts += _code_parts(value, seen)
+        elif isinstance(value, (bool, int, float, str, tuple, list, dict)):
+            parts.append(f"{name}={value!r}")
+    return parts
+
+def feature_key(name):
+    """
+    Huella del código de una feature: su función, su prepare y lo que ambos
+    usan del módulo. Si cambia, la feature se recalcula en todas las filas.
+    """
+    spec = FEATURES[name]
+    seen = set()
+    parts = _code_parts(spec["func"], seen)
+    if spec["prepare"] is not None:
+        parts += _code_parts(spec["prepare"], seen)
+    return hashlib.blake2b("|".join(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+def compute_feature(name, columns, params, chunk_rows=CHUNK_ROWS):
+    """
+    Calcula una feature por trozos de filas sobre arrays de NumPy.
+    """
+    func = FEATURES[name]["func"]
+    n = len(columns[0]) if columns else 0
+    out = np.empty(n, dtype="float64")
+    for start in range(0, n, chunk_rows):
+        end = start + chunk_rows
+        out[start:end] = func(*(col[start:end] for col in columns), **params)
+    return out
+
+def read_manifest():
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _same(a, b):
+    # Igualdad elemento a elemento en la que dos NaN cuentan como iguales
+    return (a == b) | (np.isnan(a) & np.isnan(b))
+
+def build_features(df: pd.DataFrame, previous: pd.DataFrame = None, manifest=None):
+    """
+    Añade al DataFrame las features registradas cuyas entradas existen,
+    reutilizando por fila el artefacto anterior: un negocio conserva su valor
+    si ya estaba y sus columnas de entrada no han cambiado. Añadir o quitar
+    negocios solo calcula esas filas. Se recalcula todo si cambia el código
+    de la feature (feature_key) o los parámetros globales de su prepare (que
+    dependen de todas las filas, p. ej. la media a priori). Devuelve el
+    DataFrame y el manifiesto con la huella, los parámetros, las filas
+    calculadas y el tiempo de cada feature.
+    """
+    manifest = manifest or {}
+    found = np.zeros(len(df), dtype=bool)
+    # Un artefacto anterior vacío es como no tenerlo: se calcula todo
+    if previous is not None and len(previous) == 0:
+        previous = None
+    if previous is not None:
+        previous = previous.drop_duplicates("business_id").set_index("business_id")
+        positions = previous.index.get_indexer(df["business_id"])
+        found = positions >= 0
+        previous = previous.iloc[np.maximum(positions, 0)]
+
+    new_manifest = {"features": {}}
+    for name, spec in FEATURES.items():
+        if not set(spec["inputs"]).issubset(df.columns):
+            print(f"⏭️  {name}: faltan columnas de entrada")
+            continue
+        start = time.perf_counter()
+        key = feature_key(name)
+        columns = [df[col].to_numpy(dtype="float64", na_value=np.nan) for col in spec["inputs"]]
+        params = spec["prepare"](*columns) if spec["prepare"] is not None else {}
+        old = manifest.get("features", {}).get(name, {})
+
+        reuse = np.zeros(len(df), dtype=bool)
+        if (
+            previous is not None
+            and old.get("key") == key
+            and old.get("params") == json.loads(json.dumps(params))
+            and {name, *spec["inputs"]}.issubset(previous.columns)
+        ):
+            reuse = found.copy()
+            for col, values in zip(spec["inputs"], columns):
+                reuse &= _same(values, previous[col].to_numpy(dtype="float64", na_value=np.nan))
+
+        values = np.empty(len(df), dtype="float64")
+        if reuse.any():
+            values[reuse] = previous[name].to_numpy(dtype="float64", na_value=np.nan)[reuse]
+        pending = ~reuse
+        if pending.any():
+            values[pending] = compute_feature(name, [col[pending] for col in columns], params)
+        df[name] = values
+        elapsed = time.perf_counter() - start
+
+        computed = int(pending.sum())
+        status = "sin cambios" if computed == 0 else f"{computed} filas calculadas"
+        new_manifest["features"][name] = {
+            "key": key, "params": params, "rows": computed, "seconds": round(elapsed, 4), "status": status,
+        }
+        print(f"   {name}: {status} en {elapsed:.3f}s")
+    return df, new_manifest
+
+if __name__ == "__main__":
+    with profile_run("features"):
+        with profile("read_artifacts") as section:
+            df = read_artifact("reviews_business")
+
+            # Estadísticas de las reviews por negocio (varianza, histograma, fechas, votos)
+            if os.path.exists(artifact_path("review_stats")):
+                df = df.merge(read_artifact("review_stats"), on="business_id", how="left")
+
+            # Valoración y reviews efectivas ponderadas por la credibilidad del revisor
+            if os.path.exists(artifact_path("review_credibility")):
+                df = df.merge(read_artifact("review_credibility"), on="business_id", how="left")
+
+            # Actividad reciente y tendencia a partir del cubo (negocio × mes)
+            if os.path.exists(artifact_path("review_trends")):
+                df = df.merge(read_artifact("review_trends"), on="business_id", how="left")
+
+            previous = None
+            if os.path.exists(artifact_path("featured_business")):
+                previous = read_artifact("featured_business")
+            section["rows_out"] = len(df)
 
-df = pd.read_csv("data/reviews_business.csv")
+        with profile("build_features", rows_in=len(df)) as section:
+            df, manifest = build_features(df, previous, read_manifest())
+            section["rows_out"] = len(df)
 
-df["review_power_score"] = df["stars"] * np.log1p(df["review_count"])
+        # Segmentación por reglas (percentiles de RPS, reseñas y valoración)
+        with profile("segment", rows_in=len(df)):
+            df["sector"] = segment(df)
 
-df.to_csv("data/featured_business.csv", index=False)
+        with profile("write_artifact", rows_in=len(df)):
+            write_artifact(df, "featured_business")
+            with open(MANIFEST_PATH, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2)
 
-print("✅ Features generadas")
+    print("✅ Features generadas")
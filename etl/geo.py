@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+
+from etl.artifacts import artifact_path, read_artifact, write_artifact
+from etl.profiling import profile, profile_run
+from etl.segmentation import CLASSIFICATION
+
+# Precisión (en caracteres de geohash) de cada nivel de zoom agregado:
+# 3 ≈ celdas de 156 km (vista global), 4 ≈ 39 km (vista de estado)
+PRECISIONS = {"global": 3, "state": 4}
+
+SECTOR_KEYS = {label: key for key, label in CLASSIFICATION.items()}
+
+def _bits(precision):
+    # Un geohash de p caracteres usa 5p bits, repartidos entre longitud y latitud
+    bits = 5 * precision
+    return (bits + 1) // 2, bits // 2
+
+def cell_codes(latitude, longitude, precision):
+    """
+    Celda de la rejilla de geohash de la precisión dada para cada punto,
+    codificada como entero (fila de latitud × columnas + columna de longitud).
+    Es la misma rejilla que el geohash, sin construir las cadenas de texto.
+    """
+    lon_bits, lat_bits = _bits(precision)
+    lon_q = np.floor((np.asarray(longitude, dtype="float64") + 180) / 360 * 2 ** lon_bits)
+    lat_q = np.floor((np.asarray(latitude, dtype="float64") + 90) / 180 * 2 ** lat_bits)
+    lon_q = np.clip(np.nan_to_num(lon_q), 0, 2 ** lon_bits - 1).astype("int64")
+    lat_q = np.clip(np.nan_to_num(lat_q), 0, 2 ** lat_bits - 1).astype("int64")
+    return lat_q * 2 ** lon_bits + lon_q
+
+def cell_size_km(precision):
+    # Lado aproximado de la celda en el ecuador
+    lon_bits, _ = _bits(precision)
+    return 40075 / 2 ** lon_bits
+
+def aggregate_cells(df: pd.DataFrame, codes) -> pd.DataFrame:
+    """
+    Agrega los negocios por celda: número de negocios, RPS medio, centroide
+    de los puntos y mezcla de sectores (conteo por sector y predominante).
+    """
+    cells = pd.DataFrame({
+        "cell": np.asarray(codes),
+        "latitude": df["latitude"].to_numpy(dtype="float64"),
+        "longitude": df["longitude"].to_numpy(dtype="float64"),
+        "review_power_score": df["review_power_score"].to_numpy(dtype="float64"),
+        "sector": df["sector"].astype(str).map(SECTOR_KEYS).fillna("others").to_numpy(),
+    })
+    grouped = cells.groupby("cell", sort=True)
+    agg = pd.DataFrame({
+        "count": grouped.size(),
+        "latitude": grouped["latitude"].mean(),
+        "longitude": grouped["longitude"].mean(),
+        "mean_rps": grouped["review_power_score"].mean(),
+    })
+    mix = pd.crosstab(cells["cell"], cells["sector"]).reindex(columns=list(CLASSIFICATION), fill_value=0)
+    agg = agg.join(mix)
+    agg["dominant_sector"] = mix.idxmax(axis=1).map(CLASSIFICATION)
+    return agg.reset_index()
+
+def _zoom(lat_span, lon_span):
+    # Zoom de la vista para que el recuadro quepa aproximadamente en pantalla
+    span = max(lon_span, lat_span * 2, 0.01)
+    return float(np.clip(np.log2(360 / span), 2, 13))
+
+def compute_bounds(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Centro (punto medio del recuadro) y zoom de la vista del mapa para todo
+    el dataset, cada estado y cada (estado, ciudad). state y city vacíos
+    indican que el filtro no se aplica.
+    """
+    coords = pd.DataFrame({
+        "state": df["state"].astype(str).to_numpy(),
+        "city": df["city"].astype(str).to_numpy(),
+        "latitude": df["latitude"].to_numpy(dtype="float64"),
+        "longitude": df["longitude"].to_numpy(dtype="float64"),
+    }).dropna(subset=["latitude", "longitude"])
+
+    frames = [coords.assign(state="", city="")]
+    frames.append(coords.assign(city=""))
+    frames.append(coords)
+    stacked = pd.concat(frames, ignore_index=True)
+
+    grouped = stacked.groupby(["state", "city"], sort=False)
+    bounds = grouped.agg(
+        lat_min=("latitude", "min"), lat_max=("latitude", "max"),
+        lon_min=("longitude", "min"), lon_max=("longitude", "max"),
+    ).reset_index()
+    bounds["latitude"] = (bounds["lat_min"] + bounds["lat_max"]) / 2
+    bounds["longitude"] = (bounds["lon_min"] + bounds["lon_max"]) / 2
+    bounds["zoom"] = [
+        _zoom(lat_max - lat_min, lon_max - lon_min)
+        for lat_min, lat_max, lon_min, lon_max in bounds[["lat_min", "lat_max", "lon_min", "lon_max"]].to_numpy()
+    ]
+    return bounds
+
+def bounds_lookup(bounds: pd.DataFrame):
+    """
+    Diccionario (estado, ciudad) -> vista del mapa (latitud, longitud, zoom),
+    con "Todos"/"Todas" para los filtros no aplicados como en el dashboard.
+    """
+    return {
+        (state or "Todos", city or "Todas"): {"latitude": float(lat), "longitude": float(lon), "zoom": float(zoom)}
+        for state, city, lat, lon, zoom in bounds[["state", "city", "latitude", "longitude", "zoom"]].itertuples(index=False)
+    }
+
+def build_geo(df: pd.DataFrame):
+    """
+    Capa geoespacial precalculada:
+      - geo_index: celda de cada negocio en cada nivel (alineado con las filas)
+      - geo_cells: celdas agregadas de todo el dataset en cada nivel
+      - geo_bounds: centro y zoom de la vista por estado y ciudad
+    """
+    index = pd.DataFrame({
+        f"cell_{level}": cell_codes(df["latitude"], df["longitude"], precision)
+        for level, precision in PRECISIONS.items()
+    })
+    cells = pd.concat([
+        aggregate_cells(df, index[f"cell_{level}"]).assign(level=level)
+        for level in PRECISIONS
+    ], ignore_index=True)
+    return {"geo_index": index, "geo_cells": cells, "geo_bounds": compute_bounds(df)}
+
+if __name__ == "__main__":
+    with profile_run("geo"):
+        df = read_artifact(
+            "business_clustered", ["state", "city", "latitude", "longitude", "review_power_score", "sector"]
+        )
+        with profile("build_geo", rows_in=len(df)):
+            tables = build_geo(df)
+        for name, table in tables.items():
+            with profile(f"write_{name}", rows_in=len(table)):
+                write_artifact(table, name)
+            print(f"✅ {name} guardado en {artifact_path(name)} ({len(table)} filas)")
@@ -1,43 +1,444 @@
+import hashlib
 import json
 import os
-from pymongo import MongoClient
+from datetime import datetime
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
 from tqdm import tqdm
 
-client = MongoClient("mongodb://mongo:27017/")
-db = client["yelp"]
+from etl.db import get_db, init_worker
+from etl.profiling import profile, profile_run
 
-BASE_PATH = "/data/raw"
+db = get_db()
+
+BASE_PATH = os.environ.get("RAW_PATH", "/data/raw")
 BATCH_SIZE = 10000
 
-def load_json(filename, collection):
-    path = os.path.join(BASE_PATH, filename)
+# Carga paralela: tamaño de cada trozo del fichero y número de procesos
+CHUNK_BYTES = 16 * 1024 * 1024
+WORKERS = os.cpu_count() or 1
+CHECKPOINT_PATH = "data/checkpoints"
+
+# Carga incremental: negocios y buckets (negocio, mes) afectados para las etapas posteriores
+CHANGED_IDS_PATH = "data/changed_business_ids.json"
+CHANGED_BUCKETS_PATH = "data/changed_buckets.json"
+
+# Clave natural de cada colección, usada como _id para que reanudar sea idempotente
+KEY_FIELDS = {
+    "business": "business_id",
+    "review": "review_id",
+    "review_compact": "review_id",
+    "user": "user_id",
+}
+
+# Colección de texto de las reviews en modo compacto ("separate") o descarte ("drop")
+REVIEW_TEXT = os.environ.get("REVIEW_TEXT", "separate")
+REVIEW_TEXT_COLLECTION = "review_text"
+
+def compact_review(doc):
+    """
+    Proyección analítica de una review: solo ids y campos numéricos con tipos
+    compactos (estrellas como entero, fecha como date de BSON en lugar de texto).
+    El _id es el review_id, igual que en la colección completa.
+    """
+    date = doc.get("date")
+    return {
+        "_id": doc["review_id"],
+        "_hash": doc["_hash"],
+        "business_id": doc.get("business_id"),
+        "user_id": doc.get("user_id"),
+        "stars": int(doc["stars"]) if doc.get("stars") is not None else None,
+        "date": datetime.strptime(date, "%Y-%m-%d %H:%M:%S") if date else None,
+        "useful": int(doc.get("useful") or 0),
+        "funny": int(doc.get("funny") or 0),
+        "cool": int(doc.get("cool") or 0),
+    }
+
+def compact_user(doc):
+    """
+    Perfil del usuario con los campos que usa el peso de credibilidad. Se
+    descarta la lista de amigos, que es la mayor parte del registro.
+    """
+    elite = doc.get("elite") or ""
+    return {
+        "_id": doc["user_id"],
+        "_hash": doc["_hash"],
+        "review_count": int(doc.get("review_count") or 0),
+        "fans": int(doc.get("fans") or 0),
+        # Años como élite; el dump escribe a veces 2020 como "20,20"
+        "elite_years": len({year.strip() for year in elite.split(",") if year.strip()}),
+        "average_stars": float(doc.get("average_stars") or 0),
+        "yelping_since": doc.get("yelping_since"),
+    }
+
+def review_month(date):
+    # Mes "YYYY-MM" de una review: texto en el dump y date de BSON en la compacta
+    if isinstance(date, datetime):
+        return date.strftime("%Y-%m")
+    if isinstance(date, str) and len(date) >= 7:
+        return date[:7]
+    return None
+
+# Colecciones derivadas: se construyen transformando el registro del dump
+TRANSFORMS = {
+    "review_compact": compact_review,
+    "user": compact_user,
+}
+
+def _checkpoint_file(collection):
+    return os.path.join(CHECKPOINT_PATH, f"{collection}.json")
+
+def read_checkpoint(collection):
+    path = _checkpoint_file(collection)
+    if not os.path.exists(path):
+        return None
     with open(path, "r", encoding="utf-8") as f:
-        total = sum(1 for _ in f)
-    coleccion_count = db[collection].count_documents({})
-    if coleccion_count > 0:
-        print(f"✅ La colección '{collection}' ya tiene {total} registros. No se cargan datos.")
+        return json.load(f)
+
+def write_checkpoint(collection, state):
+    """
+    Escribe el checkpoint de forma atómica (fichero temporal + rename) para
+    que una caída a mitad de escritura no deje un JSON corrupto.
+    """
+    os.makedirs(CHECKPOINT_PATH, exist_ok=True)
+    path = _checkpoint_file(collection)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+def chunk_offsets(path, start=0, chunk_bytes=CHUNK_BYTES):
+    """
+    Divide el fichero en rangos de bytes [inicio, fin) alineados a final de línea.
+    Solo hace un seek + readline por trozo, sin leer el fichero completo.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        pos = start
+        while pos < size:
+            f.seek(min(pos + chunk_bytes, size))
+            f.readline()
+            end = min(f.tell(), size)
+            yield pos, end
+            pos = end
+
+def content_hash(doc):
+    """
+    Hash estable del contenido de un registro del dump (claves ordenadas),
+    usado para detectar registros sin cambios en la carga incremental.
+    """
+    raw = json.dumps(doc, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+def _parse_lines(data, collection):
+    key = KEY_FIELDS.get(collection)
+    docs = []
+    for line in data.splitlines():
+        if not line.strip():
+            continue
+        doc = json.loads(line)
+        doc["_hash"] = content_hash(doc)
+        if key and doc.get(key) is not None:
+            doc["_id"] = doc[key]
+        docs.append(doc)
+    return docs
+
+def _split_text(raw_docs, collection):
+    """
+    Para las colecciones derivadas devuelve los documentos transformados y,
+    si procede, los documentos de texto que se guardan aparte.
+    """
+    transform = TRANSFORMS.get(collection)
+    if transform is None:
+        return raw_docs, []
+    docs = [transform(doc) for doc in raw_docs]
+    texts = []
+    if REVIEW_TEXT == "separate" and collection == "review_compact":
+        texts = [{"_id": doc["_id"], "text": doc.get("text")} for doc in raw_docs]
+    return docs, texts
+
+def _insert_many_ignoring_duplicates(collection, docs):
+    inserted = 0
+    for i in range(0, len(docs), BATCH_SIZE):
+        try:
+            result = get_db()[collection].insert_many(docs[i:i + BATCH_SIZE], ordered=False)
+            inserted += len(result.inserted_ids)
+        except BulkWriteError as e:
+            if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                raise
+            inserted += e.details.get("nInserted", 0)
+    return inserted
+
+def _read_range(path, start, end):
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start)
+
+def _insert_chunk(path, collection, start, end):
+    """
+    Lee y parsea un rango de líneas del fichero e inserta los documentos en
+    lotes no ordenados. Los duplicados (trozos ya insertados antes de una
+    caída) se ignoran gracias a que _id es la clave natural.
+    """
+    docs, texts = _split_text(_parse_lines(_read_range(path, start, end), collection), collection)
+
+    inserted = _insert_many_ignoring_duplicates(collection, docs)
+    if texts:
+        _insert_many_ignoring_duplicates(REVIEW_TEXT_COLLECTION, texts)
+    return start, end, inserted
+
+def load_json_parallel(filename, collection, workers=WORKERS, chunk_bytes=CHUNK_BYTES):
+    """
+    Carga un fichero JSON lines en una sola pasada:
+      - divide el fichero en trozos por offset de bytes
+      - cada proceso parsea su trozo e inserta con insert_many no ordenado
+      - guarda un checkpoint (offset + registros insertados) con el prefijo
+        de trozos ya completados, para reanudar tras una caída
+    El progreso se calcula sobre los bytes procesados, sin contar líneas antes.
+    """
+    path = os.path.join(BASE_PATH, filename)
+    size = os.path.getsize(path)
+
+    checkpoint = read_checkpoint(collection)
+    if checkpoint is not None and (checkpoint.get("file") != filename or checkpoint.get("size") != size):
+        print(f"⚠️  El checkpoint de '{collection}' no corresponde a {filename}. No se cargan datos.")
         return
-    if coleccion_count > 0:
-        print(f"⚠️  La colección '{collection}' tiene {coleccion_count} registros. Se eliminará.")
-        db[collection].drop()
-    count = 0
-    with open(path, "r", encoding="utf-8") as f, tqdm(total=total, desc=f"Cargando {collection}") as pbar:
-        batch = []
-        for line in f:
-            batch.append(json.loads(line))
-            if len(batch) == BATCH_SIZE:
-                db[collection].insert_many(batch)
-                count += len(batch)
-                batch = []
-                pbar.update(BATCH_SIZE)
-        if batch:
-            db[collection].insert_many(batch)
-            count += len(batch)
-            pbar.update(len(batch))
-    print(f"Total de registros cargados en '{collection}': {count}")
+    if checkpoint is not None and checkpoint.get("done"):
+        print(f"✅ La colección '{collection}' ya tiene {checkpoint['inserted']} registros. No se cargan datos.")
+        return
+    if checkpoint is None and db[collection].count_documents({}, limit=1) > 0:
+        print(f"✅ La colección '{collection}' ya tiene datos. No se cargan datos.")
+        return
+
+    offset = checkpoint["offset"] if checkpoint else 0
+    count = checkpoint["inserted"] if checkpoint else 0
+    if offset:
+        print(f"🔁 Reanudando '{collection}' desde el byte {offset} ({count} registros ya cargados)")
+
+    state = {"file": filename, "size": size, "offset": offset, "inserted": count, "done": False}
+    write_checkpoint(collection, state)
+
+    # Trozos terminados fuera de orden, pendientes de avanzar el offset contiguo
+    finished = {}
+    offsets = chunk_offsets(path, offset, chunk_bytes)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool, \
+            tqdm(total=size, initial=offset, unit="B", unit_scale=True, desc=f"Cargando {collection}") as pbar:
+        pending = set()
+        for start, end in offsets:
+            pending.add(pool.submit(_insert_chunk, path, collection, start, end))
+            # Limita los trozos en vuelo para acotar la memoria
+            if len(pending) < workers * 2:
+                continue
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                start_done, end_done, inserted = future.result()
+                finished[start_done] = (end_done, inserted)
+                pbar.update(end_done - start_done)
+            _advance_checkpoint(collection, state, finished)
+
+        for future in pending:
+            start_done, end_done, inserted = future.result()
+            finished[start_done] = (end_done, inserted)
+            pbar.update(end_done - start_done)
+        _advance_checkpoint(collection, state, finished)
+
+    state["done"] = True
+    write_checkpoint(collection, state)
+    print(f"Total de registros cargados en '{collection}': {state['inserted']}")
+    return state["inserted"]
+
+def _advance_checkpoint(collection, state, finished):
+    # Avanza el offset mientras el siguiente trozo contiguo esté terminado
+    advanced = False
+    while state["offset"] in finished:
+        end, inserted = finished.pop(state["offset"])
+        state["offset"] = end
+        state["inserted"] += inserted
+        advanced = True
+    if advanced:
+        write_checkpoint(collection, state)
+
+def _delta_chunk(path, collection, start, end):
+    """
+    Aplica un rango del fichero como carga incremental:
+      - compara el hash de contenido con el guardado en Mongo (_hash)
+      - inserta los registros nuevos y reemplaza los modificados, ambos con
+        upsert: una clave repetida en el dump (o en dos trozos que se cargan
+        a la vez) se queda con la última versión en lugar de fallar
+      - omite los que no han cambiado y los que no tienen clave natural
+    Devuelve los contadores, los business_id afectados y los buckets
+    (business_id, mes) de las reviews nuevas o modificadas; de las
+    modificadas también el negocio y el bucket anteriores, por si la review
+    cambió de negocio o de fecha.
+    """
+    # La clave natural está en _id en todas las colecciones (ver _parse_lines)
+    key = "_id"
+    raw_docs = _parse_lines(_read_range(path, start, end), collection)
+    valid_docs = [doc for doc in raw_docs if doc.get(KEY_FIELDS[collection]) is not None]
+    invalid = len(raw_docs) - len(valid_docs)
+    docs, texts = _split_text(valid_docs, collection)
+    texts = {doc["_id"]: doc for doc in texts}
+    # Dentro del trozo, una clave repetida se queda con su última aparición
+    # (las escrituras no ordenadas no garantizan cuál se aplicaría antes)
+    unique_docs = list({doc[key]: doc for doc in docs}.values())
+
+    inserted = updated = 0
+    skipped = len(docs) - len(unique_docs)
+    docs = unique_docs
+    changed_business = set()
+    changed_buckets = set()
+    for i in range(0, len(docs), BATCH_SIZE):
+        batch = docs[i:i + BATCH_SIZE]
+        existing = {
+            d[key]: d
+            for d in get_db()[collection].find(
+                {key: {"$in": [doc[key] for doc in batch]}},
+                {"_hash": 1, "business_id": 1, "date": 1},
+            )
+        }
+
+        ops = []
+        text_ops = []
+        for doc in batch:
+            if doc[key] not in existing:
+                ops.append(ReplaceOne({key: doc[key]}, doc, upsert=True))
+                inserted += 1
+            elif existing[doc[key]].get("_hash") != doc["_hash"]:
+                ops.append(ReplaceOne({key: doc[key]}, doc, upsert=True))
+                updated += 1
+                old = existing[doc[key]]
+                if old.get("business_id") is not None:
+                    changed_business.add(old["business_id"])
+                    if review_month(old.get("date")):
+                        changed_buckets.add((old["business_id"], review_month(old["date"])))
+            else:
+                skipped += 1
+                continue
+            if doc["_id"] in texts:
+                text = texts[doc["_id"]]
+                text_ops.append(ReplaceOne({"_id": text["_id"]}, text, upsert=True))
+            if doc.get("business_id") is not None:
+                changed_business.add(doc["business_id"])
+                if review_month(doc.get("date")):
+                    changed_buckets.add((doc["business_id"], review_month(doc["date"])))
+
+        if ops:
+            get_db()[collection].bulk_write(ops, ordered=False)
+        if text_ops:
+            get_db()[REVIEW_TEXT_COLLECTION].bulk_write(text_ops, ordered=False)
+
+    counts = {"inserted": inserted, "updated": updated, "skipped": skipped, "invalid": invalid}
+    return counts, changed_business, changed_buckets
+
+def load_json_delta(filename, collection, workers=WORKERS, chunk_bytes=CHUNK_BYTES):
+    """
+    Carga incremental de un dump nuevo sobre una colección ya poblada, usando
+    la clave natural (business_id / review_id / user_id). Devuelve los
+    contadores de insertados, actualizados, omitidos y sin clave, el conjunto de
+    business_id afectados y el de buckets (business_id, mes) de reviews.
+    """
+    path = os.path.join(BASE_PATH, filename)
+    size = os.path.getsize(path)
+
+    totals = {"inserted": 0, "updated": 0, "skipped": 0, "invalid": 0}
+    changed_business = set()
+    changed_buckets = set()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool, \
+            tqdm(total=size, unit="B", unit_scale=True, desc=f"Actualizando {collection}") as pbar:
+        pending = {}
+        for start, end in chunk_offsets(path, 0, chunk_bytes):
+            pending[pool.submit(_delta_chunk, path, collection, start, end)] = end - start
+            # Limita los trozos en vuelo para acotar la memoria
+            while len(pending) >= workers * 2 or (pending and end == size):
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    counts, changed, buckets = future.result()
+                    for name, value in counts.items():
+                        totals[name] += value
+                    changed_business |= changed
+                    changed_buckets |= buckets
+                    pbar.update(pending.pop(future))
+
+    print(
+        f"Colección '{collection}': {totals['inserted']} insertados, "
+        f"{totals['updated']} actualizados, {totals['skipped']} sin cambios, {totals['invalid']} sin clave"
+    )
+    return totals, changed_business, changed_buckets
+
+def write_changed_business_ids(business_ids):
+    """
+    Guarda los business_id afectados por la carga incremental para que las
+    etapas posteriores solo recalculen esos negocios.
+    """
+    os.makedirs(os.path.dirname(CHANGED_IDS_PATH), exist_ok=True)
+    with open(CHANGED_IDS_PATH, "w", encoding="utf-8") as f:
+        json.dump(sorted(business_ids), f)
+    print(f"📝 {len(business_ids)} negocios afectados guardados en {CHANGED_IDS_PATH}")
+
+def read_changed_business_ids():
+    # Negocios afectados por la última carga incremental (None si no hay fichero)
+    if not os.path.exists(CHANGED_IDS_PATH):
+        return None
+    with open(CHANGED_IDS_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+def write_changed_buckets(buckets):
+    """
+    Guarda los buckets (business_id, mes) tocados por la carga incremental:
+    el cubo mensual de reviews (etl/cube.py) solo recalcula esos.
+    """
+    os.makedirs(os.path.dirname(CHANGED_BUCKETS_PATH), exist_ok=True)
+    with open(CHANGED_BUCKETS_PATH, "w", encoding="utf-8") as f:
+        json.dump(sorted(buckets), f)
+    print(f"📝 {len(buckets)} buckets mensuales afectados guardados en {CHANGED_BUCKETS_PATH}")
+
+def clear_changed():
+    """
+    Borra los negocios y buckets afectados: solo valen para las etapas de la
+    misma ejecución que hizo la carga incremental. Sin ellos, clean y cube
+    reconstruyen todo.
+    """
+    for path in (CHANGED_IDS_PATH, CHANGED_BUCKETS_PATH):
+        if os.path.exists(path):
+            os.remove(path)
 
 if __name__ == "__main__":
-    # load_json("yelp_academic_dataset_business.json", "business")
-    # load_json("yelp_academic_dataset_review.json", "review")
-    # load_json("yelp_academic_dataset_user.json", "user")
+    # COMPACT_REVIEWS=1 guarda las reviews en la colección analítica review_compact
+    review_collection = "review_compact" if os.environ.get("COMPACT_REVIEWS") == "1" else "review"
+
+    with profile_run("load_data"):
+        # LOAD_MODE=delta aplica un dump nuevo sobre las colecciones existentes
+        if os.environ.get("LOAD_MODE", "full") == "delta":
+            changed = set()
+            buckets = set()
+            for filename, collection in [
+                ("yelp_academic_dataset_business.json", "business"),
+                ("yelp_academic_dataset_review.json", review_collection),
+                ("yelp_academic_dataset_user.json", "user"),
+            ]:
+                if collection == "user" and not os.path.exists(os.path.join(BASE_PATH, filename)):
+                    continue
+                with profile(f"delta_{collection}") as section:
+                    totals, changed_ids, changed_buckets = load_json_delta(filename, collection)
+                    section["rows_out"] = totals
+                changed |= changed_ids
+                buckets |= changed_buckets
+            write_changed_business_ids(changed)
+            write_changed_buckets(buckets)
+        else:
+            # Una carga completa no deja negocios afectados de una carga anterior
+            clear_changed()
+            for filename, collection in [
+                ("yelp_academic_dataset_business.json", "business"),
+                ("yelp_academic_dataset_review.json", review_collection),
+                # Usuarios (perfil compacto) para el peso de credibilidad; opcional
+                ("yelp_academic_dataset_user.json", "user"),
+            ]:
+                if collection == "user" and not os.path.exists(os.path.join(BASE_PATH, filename)):
+                    print(f"⚠️  No existe {filename}, se omite")
+                    continue
+                with profile(f"load_{collection}") as section:
+                    section["rows_out"] = load_json_parallel(filename, collection)
     print("✅ Datos cargados en MongoDB")
@@ -0,0 +1,282 @@
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+from etl.artifacts import artifact_path, read_artifact, write_artifact
+from etl.categories import build_category_index
+from etl.profiling import profile, profile_run
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Radios (km) en los que se cuentan competidores de la misma categoría
+COMPETITOR_RADII_KM = [float(r) for r in os.environ.get("COMPETITOR_RADII_KM", "1,5").split(",")]
+# Pares para el percentil de RPS: los PEERS_K más cercanos de la categoría dentro de PEER_RADIUS_KM
+PEERS_K = int(os.environ.get("PEERS_K", 20))
+PEER_RADIUS_KM = float(os.environ.get("PEER_RADIUS_KM", 5))
+# Negocios similares cercanos que se guardan por negocio para el dashboard
+SIMILAR_K = int(os.environ.get("SIMILAR_K", 10))
+# Negocios por consulta al árbol (acota la memoria de los pares de vecinos:
+# en el centro de una ciudad hay miles de negocios a menos de 5 km)
+QUERY_BATCH = 5000
+
+def competitor_column(radius):
+    return f"competitors_{radius:g}km"
+
+def primary_category(categories: pd.Series, index=None):
+    """
+    Categoría principal de cada negocio: la más específica que tiene, es
+    decir, la menos frecuente del dataset ("Sushi Bars" antes que
+    "Restaurants"). Devuelve el código de cada fila (-1 sin categorías) y
+    el vocabulario.
+    """
+    if index is None:
+        index = build_category_index(categories)
+    membership = index["membership"]
+    frequency = np.asarray(membership.sum(axis=0)).ravel()
+
+    codes = np.full(membership.shape[0], -1, dtype="int64")
+    filled = np.flatnonzero(np.diff(membership.indptr) > 0)
+    if len(filled):
+        # Mínimo por fila de (frecuencia, código), codificado en un solo entero
+        vocab_size = len(index["vocab"])
+        key = frequency[membership.indices] * vocab_size + membership.indices
+        codes[filled] = np.minimum.reduceat(key, membership.indptr[filled]) % vocab_size
+    return codes, index["vocab"]
+
+def unit_vectors(latitude, longitude):
+    """
+    Puntos sobre la esfera unidad. La distancia euclídea entre ellos (la
+    cuerda) crece con la distancia de haversine, así que los vecinos y los
+    radios son los mismos, pero el árbol evita la trigonometría en cada
+    comparación.
+    """
+    lat, lon = np.radians(latitude), np.radians(longitude)
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+def chord(km):
+    return 2 * np.sin(np.asarray(km) / EARTH_RADIUS_KM / 2)
+
+def chord_km(distance):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(distance / 2, 1))
+
+def category_rank(membership):
+    # Posición de cada categoría ordenadas de más a menos frecuente
+    frequency = np.bincount(membership.indices, minlength=membership.shape[1])
+    rank = np.empty(membership.shape[1], dtype="int64")
+    rank[np.argsort(-frequency, kind="stable")] = np.arange(membership.shape[1])
+    return rank
+
+def category_bits(membership, rank):
+    """
+    Categorías de cada negocio como máscara de bits (palabras de 64 bits ×
+    negocio), con el bit de cada categoría en su posición de category_rank:
+    las categorías más frecuentes que una dada son los bits anteriores.
+    """
+    n, vocab_size = membership.shape
+    bits = np.zeros((max(-(-vocab_size // 64), 1), n), dtype="uint64")
+    rows = np.repeat(np.arange(n), np.diff(membership.indptr))
+    cols = rank[membership.indices]
+    np.bitwise_or.at(bits, (cols // 64, rows), np.left_shift(np.uint64(1), (cols % 64).astype("uint64")))
+    return bits
+
+def _earlier_shared(bits, position, owner, neighbor):
+    """
+    Pares (negocio, vecino) que ya comparten alguna categoría más frecuente
+    que la de posición position (bits anteriores en category_bits).
+    """
+    word, bit = divmod(int(position), 64)
+    shared = np.zeros(len(owner), dtype=bool)
+    for w in range(word + 1):
+        mask = bits[w][owner]
+        if w == word:
+            mask = mask & np.uint64((1 << bit) - 1)
+        shared |= (mask & bits[w][neighbor]) != 0
+    return shared
+
+def competitor_features(df, membership, valid, xyz, radii=COMPETITOR_RADII_KM, peers_k=PEERS_K,
+                        peer_radius=PEER_RADIUS_KM, batch=QUERY_BATCH):
+    """
+    Competidores: negocios que comparten al menos una categoría (cualquier
+    columna común en el índice CSR de categorías), no solo la principal.
+    Hay un KDTree por categoría y cada par se cuenta una sola vez, en la
+    categoría común más frecuente:
+      - en la categoría más frecuente del negocio basta con contar vecinos
+        (count_only, sin generar los pares)
+      - en las demás se descartan los vecinos que ya comparten una categoría
+        más frecuente (máscara de bits, ver category_bits)
+    Los pares del percentil salen de unir los peers_k más cercanos de cada
+    categoría del negocio: los peers_k más cercanos con alguna categoría
+    común están siempre entre ellos.
+    """
+    n = len(df)
+    counts = {radius: np.zeros(n, dtype="int32") for radius in radii}
+    peer_count = np.zeros(n, dtype="int32")
+    percentile = np.full(n, np.nan)
+
+    rows = np.flatnonzero(valid)
+    if len(rows) == 0:
+        return counts, peer_count, percentile
+    # A partir de aquí los negocios son posiciones dentro de rows
+    membership = membership[rows]
+    points = xyz[rows]
+    rank = category_rank(membership)
+    bits = category_bits(membership, rank)
+    first = np.minimum.reduceat(rank[membership.indices], membership.indptr[:-1])
+    by_category = membership.tocsc()
+    reach = chord(max(radii, default=0))
+    total = {radius: np.zeros(len(rows), dtype="int32") for radius in radii}
+    candidates = []
+
+    for category in np.argsort(rank):
+        members = by_category.indices[by_category.indptr[category]:by_category.indptr[category + 1]]
+        if len(members) < 2:
+            continue
+        tree = KDTree(points[members])
+        # Negocios cuya categoría más frecuente es esta
+        leading = members[first[members] == rank[category]]
+        for start in range(0, len(leading), batch):
+            part = leading[start:start + batch]
+            for radius in radii:
+                # Sin el propio negocio, que siempre está a distancia 0
+                total[radius][part] += tree.query_radius(points[part], r=chord(radius), count_only=True) - 1
+
+        rest = members[first[members] != rank[category]]
+        for start in range(0, len(rest), batch):
+            part = rest[start:start + batch]
+            found, distance = tree.query_radius(points[part], r=reach, return_distance=True)
+            owner = np.repeat(np.arange(len(part)), [len(f) for f in found])
+            neighbor = members[np.concatenate(found)]
+            distance = np.concatenate(distance)
+            keep = (neighbor != part[owner]) & ~_earlier_shared(bits, rank[category], part[owner], neighbor)
+            owner, distance = owner[keep], distance[keep]
+            for radius in radii:
+                total[radius][part] += np.bincount(owner[distance <= chord(radius)], minlength=len(part)).astype("int32")
+
+        # Se pide un vecino más para descartar el propio negocio
+        k = min(peers_k + 1, len(members))
+        for start in range(0, len(members), batch):
+            part = members[start:start + batch]
+            distance, neighbor = tree.query(points[part], k=k)
+            owner = np.repeat(part, k)
+            neighbor, distance = members[neighbor.ravel()], distance.ravel()
+            keep = (neighbor != owner) & (distance <= chord(peer_radius))
+            candidates.append((owner[keep], neighbor[keep], distance[keep]))
+
+    for radius in radii:
+        counts[radius][rows] = total[radius]
+
+    if not candidates:
+        return counts, peer_count, percentile
+    owner, neighbor, distance = (np.concatenate(column) for column in zip(*candidates))
+    # Un vecino puede aparecer en varias categorías comunes: se queda uno
+    # (clave en int64, los índices del CSR son int32)
+    _, unique = np.unique(owner.astype("int64") * len(rows) + neighbor, return_index=True)
+    owner, neighbor, distance = owner[unique], neighbor[unique], distance[unique]
+    # Orden por (negocio, distancia) con una sola clave: la distancia
+    # normalizada queda en [0, 1) y no cambia el orden entre negocios
+    order = np.argsort(owner + distance / (chord(peer_radius) * 1.001 + 1e-12), kind="stable")
+    owner, neighbor = owner[order], neighbor[order]
+    peers = np.arange(len(owner)) - np.searchsorted(owner, owner) < peers_k
+    owner, neighbor = owner[peers], neighbor[peers]
+
+    rps = df["review_power_score"].to_numpy(dtype="float64")[rows]
+    below = (rps[neighbor] < rps[owner]) + 0.5 * (rps[neighbor] == rps[owner])
+    peers = np.bincount(owner, minlength=len(rows))
+    peer_count[rows] = peers
+    with np.errstate(invalid="ignore", divide="ignore"):
+        percentile[rows] = np.where(peers > 0, 100 * np.bincount(owner, weights=below, minlength=len(rows)) / peers, np.nan)
+    return counts, peer_count, percentile
+
+def similar_features(codes, valid, xyz, similar_k=SIMILAR_K, batch=QUERY_BATCH):
+    """
+    Negocios similares: los similar_k más cercanos con la misma categoría
+    principal (la más específica), con un KDTree por categoría. Devuelve
+    la fila y la distancia de cada uno (-1 y NaN si hay menos).
+    """
+    n = len(codes)
+    similar = np.full((n, similar_k), -1, dtype="int32")
+    similar_km = np.full((n, similar_k), np.nan, dtype="float32")
+
+    order = np.flatnonzero(valid)
+    order = order[np.argsort(codes[order], kind="stable")]
+    groups = np.split(order, np.flatnonzero(np.diff(codes[order])) + 1) if len(order) else []
+    for rows in groups:
+        points = xyz[rows]
+        tree = KDTree(points)
+        # Se pide un vecino más para descartar el propio negocio
+        k = min(similar_k + 1, len(rows))
+        for start in range(0, len(rows), batch):
+            part = slice(start, start + batch)
+            distance, neighbor = tree.query(points[part], k=k)
+            # Con coordenadas repetidas el propio negocio no tiene por qué ser el
+            # primero: se quita por posición y, si no aparece, se quita el último
+            is_self = neighbor == np.arange(start, start + len(neighbor))[:, None]
+            keep = np.argsort(is_self, axis=1, kind="stable")[:, :k - 1]
+            similar[rows[part], :k - 1] = rows[np.take_along_axis(neighbor, keep, axis=1)]
+            similar_km[rows[part], :k - 1] = chord_km(np.take_along_axis(distance, keep, axis=1))
+    return similar, similar_km
+
+def neighbor_features(df: pd.DataFrame, radii=COMPETITOR_RADII_KM, peers_k=PEERS_K,
+                      peer_radius=PEER_RADIUS_KM, similar_k=SIMILAR_K, batch=QUERY_BATCH):
+    """
+    Índice espacial (KDTree sobre la esfera, ver unit_vectors) y consultas
+    vectorizadas por lotes, en lugar de comparar todos los pares:
+      - competitors_<r>km: negocios con alguna categoría en común a menos de r km
+      - peer_count, rps_peer_percentile: percentil del RPS entre los
+        PEERS_K más cercanos con alguna categoría en común a menos de
+        PEER_RADIUS_KM
+      - similar: los SIMILAR_K negocios más cercanos con la misma categoría
+        principal (fila y distancia, -1 si hay menos)
+    """
+    n = len(df)
+    index = build_category_index(df["categories"])
+    codes, vocab = primary_category(df["categories"], index)
+    valid = (codes >= 0) & df["latitude"].notna().to_numpy() & df["longitude"].notna().to_numpy()
+    xyz = unit_vectors(df["latitude"].to_numpy(dtype="float64"), df["longitude"].to_numpy(dtype="float64"))
+
+    counts, peer_count, percentile = competitor_features(
+        df, index["membership"], valid, xyz, radii, peers_k, peer_radius, batch
+    )
+    similar, similar_km = similar_features(codes, valid, xyz, similar_k, batch)
+
+    features = pd.DataFrame({
+        "primary_category": np.where(codes >= 0, vocab[np.maximum(codes, 0)], ""),
+        **{competitor_column(radius): counts[radius] for radius in radii},
+        "peer_count": peer_count,
+        "rps_peer_percentile": percentile,
+    })
+    similar = pd.DataFrame({
+        "row": np.repeat(np.arange(n, dtype="int32"), similar_k),
+        "neighbor": similar.ravel(),
+        "distance_km": similar_km.ravel(),
+    })
+    return {"business_neighbors": features, "business_similar": similar}
+
+def similar_lookup(similar: pd.DataFrame):
+    """
+    Vecinos similares como matrices (negocio × SIMILAR_K) alineadas con las
+    filas del dataset: la consulta de un negocio es una fila de la matriz.
+    """
+    width = len(similar) // (int(similar["row"].max()) + 1) if len(similar) else SIMILAR_K
+    return {
+        "neighbor": similar["neighbor"].to_numpy().reshape(-1, width),
+        "distance_km": similar["distance_km"].to_numpy().reshape(-1, width),
+    }
+
+def similar_businesses(lookup, row):
+    # Filas y distancias (km) de los negocios similares más cercanos a row
+    neighbors = lookup["neighbor"][row]
+    found = neighbors >= 0
+    return neighbors[found], lookup["distance_km"][row][found]
+
+if __name__ == "__main__":
+    with profile_run("neighbors"):
+        df = read_artifact("business_clustered", ["categories", "latitude", "longitude", "review_power_score"])
+        with profile("neighbor_features", rows_in=len(df)):
+            tables = neighbor_features(df)
+        for name, table in tables.items():
+            with profile(f"write_{name}", rows_in=len(table)):
+                write_artifact(table, name)
+            print(f"✅ {name} guardado en {artifact_path(name)} ({len(table)} filas)")
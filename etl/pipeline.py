@@ -0,0 +1,383 @@
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+from pymongo import MongoClient
+
+from etl.db import MONGO_DB, MONGO_URI
+
+PIPELINE_PATH = "data/pipeline"
+STATE_PATH = os.path.join(PIPELINE_PATH, "state.json")
+TIMINGS_PATH = os.path.join(PIPELINE_PATH, "timings.jsonl")
+
+RAW_PATH = os.environ.get("RAW_PATH", "/data/raw")
+WORKERS = int(os.environ.get("PIPELINE_WORKERS", 3))
+
+# Etapas del pipeline. Cada una declara:
+#   - module: módulo que se ejecuta con python -m
+#   - deps: etapas de las que depende
+#   - inputs: ficheros que lee (además de las salidas de sus dependencias)
+#   - outputs: ficheros (o colecciones "mongo:<nombre>") que genera; si falta
+#     alguno se vuelve a ejecutar
+#   - params: variables de entorno que cambian su resultado
+#   - transient: ficheros que solo valen para las etapas de la misma
+#     ejecución; si la etapa no se ejecuta se borran
+#   - version: se incrementa a mano para forzar la reejecución
+#   - mongo: necesita MongoDB disponible
+# El código de la etapa (el módulo y los módulos del proyecto que importa)
+# forma parte de su hash, así que cambiar una feature o un parámetro del
+# clustering vuelve a ejecutar esa etapa y las posteriores.
+STAGES = {
+    "load": {
+        "module": "etl.load_data",
+        "deps": [],
+        "inputs": [
+            os.path.join(RAW_PATH, "yelp_academic_dataset_business.json"),
+            os.path.join(RAW_PATH, "yelp_academic_dataset_review.json"),
+            os.path.join(RAW_PATH, "yelp_academic_dataset_user.json"),
+        ],
+        "outputs": ["mongo:business"],
+        "params": ["COMPACT_REVIEWS", "REVIEW_TEXT", "LOAD_MODE"],
+        # Negocios y buckets afectados por la carga incremental: si load no se
+        # ejecuta, clean y cube no deben recalcular el subconjunto de una carga
+        # anterior, sino reconstruirlo todo
+        "transient": ["data/changed_business_ids.json", "data/changed_buckets.json"],
+        "version": 1,
+        "mongo": True,
+    },
+    "schema": {
+        "module": "etl.schema",
+        "deps": ["load"],
+        "inputs": [],
+        "outputs": [],
+        "params": [],
+        "version": 1,
+        "mongo": True,
+    },
+    "clean": {
+        "module": "etl.clean_data",
+        "deps": ["schema"],
+        "inputs": [],
+        "outputs": ["mongo:business_stats", "data/reviews_business.arrow"],
+        "params": ["LOAD_MODE"],
+        "version": 1,
+        "mongo": True,
+    },
+    "review_stats": {
+        "module": "etl.review_stats",
+        "deps": ["schema"],
+        "inputs": [],
+        "outputs": ["data/review_stats.arrow"],
+        "params": [],
+        "version": 1,
+        "mongo": True,
+    },
+    "credibility": {
+        "module": "etl.credibility",
+        "deps": ["schema"],
+        "inputs": [],
+        "outputs": ["data/review_credibility.arrow"],
+        "params": [],
+        "version": 1,
+        "mongo": True,
+    },
+    "cube": {
+        "module": "etl.cube",
+        "deps": ["schema"],
+        "inputs": [],
+        "outputs": ["mongo:review_cube", "data/review_cube.arrow", "data/review_trends.arrow"],
+        "params": ["LOAD_MODE", "TREND_WINDOW", "TREND_MONTHS"],
+        "version": 1,
+        "mongo": True,
+    },
+    "features": {
+        "module": "etl.features",
+        "deps": ["clean", "review_stats", "credibility", "cube"],
+        "inputs": [],
+        "outputs": ["data/featured_business.arrow"],
+        "params": [],
+        "version": 1,
+        "mongo": False,
+    },
+    "clustering": {
+        "module": "analysis.clustering",
+        "deps": ["features"],
+        "inputs": [],
+        "outputs": ["data/business_clustered.arrow", "data/models/clustering.joblib"],
+        "params": ["N_CLUSTERS", "REFIT_CLUSTERS"],
+        "version": 1,
+        "mongo": False,
+    },
+    "categories": {
+        "module": "etl.categories",
+        "deps": ["clustering"],
+        "inputs": [],
+        "outputs": ["data/category_index.npz"],
+        "params": [],
+        "version": 1,
+        "mongo": False,
+    },
+    "topk": {
+        "module": "etl.topk",
+        "deps": ["clustering"],
+        "inputs": [],
+        "outputs": ["data/topk_rps.arrow"],
+        "params": ["TOP_K"],
+        "version": 1,
+        "mongo": False,
+    },
+    "geo": {
+        "module": "etl.geo",
+        "deps": ["clustering"],
+        "inputs": [],
+        "outputs": ["data/geo_index.arrow", "data/geo_cells.arrow", "data/geo_bounds.arrow"],
+        "params": [],
+        "version": 1,
+        "mongo": False,
+    },
+    "neighbors": {
+        "module": "etl.neighbors",
+        "deps": ["clustering"],
+        "inputs": [],
+        "outputs": ["data/business_neighbors.arrow", "data/business_similar.arrow"],
+        "params": ["COMPETITOR_RADII_KM", "PEERS_K", "PEER_RADIUS_KM", "SIMILAR_K"],
+        "version": 1,
+        "mongo": False,
+    },
+}
+
+def topological_order(stages=STAGES):
+    """
+    Orden de ejecución compatible con las dependencias. Falla si hay un
+    ciclo o una dependencia que no existe.
+    """
+    order, visiting, done = [], set(), set()
+
+    def visit(name):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Ciclo en el pipeline en la etapa {name}")
+        if name not in stages:
+            raise ValueError(f"Etapa desconocida: {name}")
+        visiting.add(name)
+        for dep in stages[name]["deps"]:
+            visit(dep)
+        visiting.discard(name)
+        done.add(name)
+        order.append(name)
+
+    for name in stages:
+        visit(name)
+    return order
+
+def module_path(module):
+    return os.path.join(*module.split(".")) + ".py"
+
+def code_files(module):
+    """
+    Fichero del módulo y de todos los módulos del proyecto (etl, analysis,
+    dashboard) que importa, directa o indirectamente.
+    """
+    files, pending = set(), [module]
+    while pending:
+        path = module_path(pending.pop())
+        if path in files or not os.path.exists(path):
+            continue
+        files.add(path)
+        with open(path, encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ImportFrom) and node.module:
+                pending.append(node.module)
+            elif isinstance(node, ast.Import):
+                pending.extend(alias.name for alias in node.names)
+    return sorted(files)
+
+def file_hash(path, cache):
+    """
+    Hash del contenido de un fichero. Se reutiliza el hash guardado mientras
+    el tamaño y la fecha de modificación no cambien, para no releer los
+    ficheros grandes (el dump de Yelp) en cada arranque.
+    """
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    cached = cache.get(path)
+    if cached and cached["size"] == stat.st_size and cached["mtime_ns"] == stat.st_mtime_ns:
+        return cached["hash"]
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    cache[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": digest.hexdigest()}
+    return cache[path]["hash"]
+
+def stage_key(name, stage, upstream, cache):
+    """
+    Hash de todo lo que determina el resultado de la etapa: versión, código,
+    parámetros, ficheros de entrada y el resultado de sus dependencias.
+    """
+    payload = {
+        "stage": name,
+        "version": stage["version"],
+        "code": {path: file_hash(path, cache) for path in code_files(stage["module"])},
+        "params": {param: os.environ.get(param) for param in stage["params"]},
+        "inputs": {path: file_hash(path, cache) for path in stage["inputs"]},
+        "deps": {dep: upstream[dep] for dep in stage["deps"]},
+    }
+    raw = json.dumps(payload, sort_keys=True)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+def _file_outputs(stage):
+    return [path for path in stage["outputs"] if not path.startswith("mongo:")]
+
+def outputs_exist(stage, db=None):
+    for output in stage["outputs"]:
+        if output.startswith("mongo:"):
+            if db is None or output[len("mongo:"):] not in db.list_collection_names():
+                return False
+        elif not os.path.exists(output):
+            return False
+    return True
+
+def output_hash(stage, key, cache):
+    """
+    Lo que ven las etapas posteriores. Si la etapa genera ficheros es el hash
+    de su contenido: una reejecución con el mismo resultado no invalida las
+    siguientes. Si solo escribe en MongoDB se usa su clave.
+    """
+    files = _file_outputs(stage)
+    if not files:
+        return key
+    raw = json.dumps({path: file_hash(path, cache) for path in files}, sort_keys=True)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+def read_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return {"stages": {}, "files": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def write_state(state, path=STATE_PATH):
+    # Escritura atómica: un fallo a mitad no deja el estado corrupto
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+def log_timing(record, path=TIMINGS_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+def wait_for_mongo(uri=MONGO_URI):
+    print("⏳ Esperando a MongoDB...")
+    client = MongoClient(uri, serverSelectionTimeoutMS=2000)
+    while True:
+        try:
+            client.admin.command("ping")
+            break
+        except Exception:
+            time.sleep(2)
+    print("✅ MongoDB disponible")
+    return client[MONGO_DB]
+
+def run_stage(name, stage):
+    """
+    Ejecuta la etapa en un proceso aparte, igual que hacía el entrypoint,
+    y devuelve su duración en segundos.
+    """
+    print(f"▶️  [{name}] python -m {stage['module']}")
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-u", "-m", stage["module"]], check=True)
+    return time.perf_counter() - start
+
+def run_pipeline(stages=STAGES, workers=WORKERS, force=False):
+    """
+    Ejecuta el DAG de etapas. Una etapa se ejecuta solo si cambia su clave o
+    falta alguna de sus salidas; las ramas independientes (clean y
+    review_stats, o categories, topk y geo) se ejecutan en paralelo. Cada
+    etapa deja una línea en el log de tiempos.
+    """
+    order = topological_order(stages)
+    state = read_state()
+    cache = state.setdefault("files", {})
+    run_id = datetime.now().isoformat(timespec="seconds")
+
+    upstream, status = {}, {}
+    db = None
+    pending = list(order)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while pending or running:
+            # Etapas cuyas dependencias ya terminaron. pending está en orden
+            # topológico, así que una cadena de etapas sin cambios se resuelve
+            # en una sola pasada
+            for name in list(pending):
+                if not all(status.get(dep) in ("ran", "skipped") for dep in stages[name]["deps"]):
+                    continue
+                pending.remove(name)
+                stage = stages[name]
+                key = stage_key(name, stage, upstream, cache)
+                previous = state["stages"].get(name, {})
+                if stage["mongo"] and db is None:
+                    db = wait_for_mongo()
+                complete = outputs_exist(stage, db)
+
+                if not force and previous.get("key") == key and complete:
+                    print(f"⏭️  [{name}] sin cambios")
+                    for path in stage.get("transient", []):
+                        if os.path.exists(path):
+                            os.remove(path)
+                    status[name] = "skipped"
+                    upstream[name] = previous["output"]
+                    log_timing({"run": run_id, "stage": name, "status": "skipped", "seconds": 0.0, "key": key})
+                    continue
+
+                running[executor.submit(run_stage, name, stage)] = (name, key)
+
+            # Si falla una etapa no se lanzan más; se espera a las que están en marcha
+            if any(s == "failed" for s in status.values()):
+                pending = []
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, key = running.pop(future)
+                try:
+                    seconds = future.result()
+                except subprocess.CalledProcessError as e:
+                    print(f"❌ [{name}] falló con código {e.returncode}")
+                    status[name] = "failed"
+                    log_timing({"run": run_id, "stage": name, "status": "failed", "key": key})
+                    continue
+
+                status[name] = "ran"
+                upstream[name] = output_hash(stages[name], key, cache)
+                state["stages"][name] = {"key": key, "output": upstream[name], "finished": datetime.now().isoformat(timespec="seconds")}
+                write_state(state)
+                log_timing({"run": run_id, "stage": name, "status": "ran", "seconds": round(seconds, 3), "key": key})
+                print(f"✅ [{name}] {seconds:.1f} s")
+
+    write_state(state)
+    failed = [name for name, s in status.items() if s == "failed"]
+    blocked = [name for name in order if name not in status]
+    if failed:
+        print(f"❌ Pipeline detenido. Fallaron: {', '.join(failed)}. Sin ejecutar: {', '.join(blocked) or '-'}")
+        return False
+    return True
+
+if __name__ == "__main__":
+    # PIPELINE_FORCE=1 vuelve a ejecutar todas las etapas
+    ok = run_pipeline(force=os.environ.get("PIPELINE_FORCE") == "1")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,239 @@
+import functools
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from pymongo import monitoring
+
+PROFILE_PATH = "data/profiles"
+# PROFILE_EXPLAIN=1 añade las estadísticas de ejecución del servidor (explain)
+# de las consultas instrumentadas; vuelve a ejecutar la consulta, así que es opcional
+PROFILE_EXPLAIN = os.environ.get("PROFILE_EXPLAIN") == "1"
+
+# Informe en curso por hilo: el dashboard atiende cada sesión en su propio hilo
+_local = threading.local()
+
+def current_rss_mb():
+    # RSS actual del proceso (Linux); None si no está disponible
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError):
+        return None
+
+def peak_rss_mb():
+    # Pico de RSS del proceso hasta ahora (KB en Linux, bytes en macOS)
+    scale = 1024 ** 2 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+def _round(value, digits=1):
+    return None if value is None else round(value, digits)
+
+def new_report(name):
+    _local.report = {
+        "name": name,
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "sections": [],
+        "_start": time.perf_counter(),
+    }
+    _local.stack = []
+    _local.lap = None
+    return _local.report
+
+def current_report():
+    return getattr(_local, "report", None)
+
+def current_section():
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else None
+
+@contextmanager
+def profile(name, rows_in=None):
+    """
+    Mide una sección: tiempo, RSS al empezar y al terminar, cuánto sube el
+    pico de RSS del proceso y filas de entrada y salida. Devuelve el
+    diccionario de la sección para anotar rows_out u otros datos. Las
+    secciones anidadas se guardan con la ruta "padre/hija".
+    """
+    report = current_report()
+    if report is None:
+        report = new_report(os.path.basename(sys.argv[0]) or "python")
+    stack = _local.stack
+
+    path = "/".join([section["name"] for section in stack] + [name])
+    section = {"name": name, "path": path, "rows_in": rows_in, "rows_out": None, "mongo": None}
+    rss_start, peak_start = current_rss_mb(), peak_rss_mb()
+    stack.append(section)
+    start = time.perf_counter()
+    try:
+        yield section
+        section["status"] = "ok"
+    except BaseException as e:
+        section["status"] = f"error: {type(e).__name__}"
+        raise
+    finally:
+        section["seconds"] = round(time.perf_counter() - start, 4)
+        section["rss_start_mb"] = _round(rss_start)
+        section["rss_end_mb"] = _round(current_rss_mb())
+        section["peak_rss_mb"] = _round(peak_rss_mb())
+        section["peak_increase_mb"] = _round(peak_rss_mb() - peak_start)
+        stack.pop()
+        report["sections"].append(section)
+
+def lap(name, rows=None):
+    """
+    Sección desde la vuelta anterior (o el inicio del informe) hasta ahora.
+    Pensado para scripts lineales como el dashboard, donde envolver cada
+    bloque en un with obligaría a reindentarlo.
+    """
+    report = current_report()
+    if report is None:
+        report = new_report(os.path.basename(sys.argv[0]) or "python")
+    now = time.perf_counter()
+    last = getattr(_local, "lap", None) or report["_start"]
+    section = {
+        "name": name,
+        "path": name,
+        "rows_in": None,
+        "rows_out": rows,
+        "mongo": None,
+        "status": "ok",
+        "seconds": round(now - last, 4),
+        "rss_end_mb": _round(current_rss_mb()),
+        "peak_rss_mb": _round(peak_rss_mb()),
+    }
+    report["sections"].append(section)
+    _local.lap = now
+    return section
+
+def _rows(value):
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+def profiled(name=None):
+    """
+    Decorador equivalente a profile(): usa el nombre de la función y, si el
+    resultado tiene longitud (DataFrame, lista...), la guarda como rows_out.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with profile(name or func.__name__) as section:
+                result = func(*args, **kwargs)
+                section["rows_out"] = _rows(result)
+                return result
+        return wrapper
+    return decorator
+
+class MongoCommandListener(monitoring.CommandListener):
+    """
+    Acumula en la sección activa los comandos enviados a MongoDB: número,
+    tiempo de ida y vuelta y documentos devueltos en los lotes del cursor.
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event, ok=True)
+
+    def failed(self, event):
+        self._record(event, ok=False)
+
+    def _record(self, event, ok):
+        section = current_section()
+        if section is None:
+            return
+        mongo = section["mongo"] or {"commands": {}, "round_trip_ms": 0.0}
+        section["mongo"] = mongo
+        stats = mongo["commands"].setdefault(event.command_name, {"count": 0, "ms": 0.0, "docs": 0, "failed": 0})
+        stats["count"] += 1
+        stats["ms"] = round(stats["ms"] + event.duration_micros / 1000, 3)
+        mongo["round_trip_ms"] = round(mongo["round_trip_ms"] + event.duration_micros / 1000, 3)
+        if not ok:
+            stats["failed"] += 1
+            return
+        cursor = event.reply.get("cursor") if hasattr(event.reply, "get") else None
+        if cursor:
+            stats["docs"] += len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+
+# Se registra al importar, antes de que etl/db.py cree el MongoClient
+monitoring.register(MongoCommandListener())
+
+def _plan_summary(stats):
+    return {
+        "execution_ms": stats.get("executionTimeMillis"),
+        "returned": stats.get("nReturned"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "docs_examined": stats.get("totalDocsExamined"),
+    }
+
+def explain_stats(db, collection, pipeline=None, query=None):
+    """
+    Estadísticas de ejecución del servidor (explain "executionStats") de un
+    aggregate o un find, anotadas en la sección activa. Solo con
+    PROFILE_EXPLAIN=1. Las etapas de escritura ($merge/$out) se quitan porque
+    no admiten explain con ejecución.
+    """
+    if not PROFILE_EXPLAIN:
+        return None
+    if pipeline is not None:
+        pipeline = [stage for stage in pipeline if not ({"$merge", "$out"} & set(stage))]
+        command = {"aggregate": collection, "pipeline": pipeline, "cursor": {}}
+    else:
+        command = {"find": collection, "filter": query or {}}
+    explained = db.command("explain", command, verbosity="executionStats")
+
+    if "executionStats" in explained:
+        summary = _plan_summary(explained["executionStats"])
+    else:
+        # aggregate con varias etapas: estadísticas de la etapa $cursor inicial
+        stages = explained.get("stages") or []
+        cursor = stages[0].get("$cursor", {}) if stages else {}
+        summary = _plan_summary(cursor.get("executionStats", {}))
+
+    section = current_section()
+    if section is not None:
+        section["explain"] = summary
+    return summary
+
+def write_report(report=None, path=PROFILE_PATH, keep_history=True):
+    """
+    Guarda el informe como <nombre>-<fecha>.json y <nombre>-latest.json.
+    """
+    report = report or current_report()
+    if report is None:
+        return None
+    os.makedirs(path, exist_ok=True)
+    report["finished"] = datetime.now().isoformat(timespec="seconds")
+    report["peak_rss_mb"] = _round(peak_rss_mb())
+    payload = json.dumps({k: v for k, v in report.items() if not k.startswith("_")}, indent=2, default=str)
+    targets = [os.path.join(path, f"{report['name']}-latest.json")]
+    if keep_history:
+        targets.append(os.path.join(path, f"{report['name']}-{datetime.now().strftime('%Y%m%dT%H%M%S')}.json"))
+    for target in targets:
+        with open(target, "w", encoding="utf-8") as f:
+            f.write(payload)
+    return targets[0]
+
+@contextmanager
+def profile_run(name):
+    """
+    Perfil de una ejecución completa de un script: abre un informe nuevo,
+    mide todo el script como sección raíz y guarda el JSON al terminar,
+    también si falla.
+    """
+    new_report(name)
+    try:
+        with profile(name) as section:
+            yield section
+    finally:
+        path = write_report()
+        print(f"⏱️  Perfil guardado en {path}")
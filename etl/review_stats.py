@@ -0,0 +1,150 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from etl.artifacts import write_artifact
+from etl.clean_data import review_collection
+from etl.columnar import cursor_batches, id_ranges, projection, range_query
+from etl.db import get_db, init_worker
+from etl.profiling import explain_stats, profile, profile_run
+
+db = get_db()
+
+BATCH_SIZE = 50000
+WORKERS = os.cpu_count() or 1
+
+REVIEW_SCHEMA = {
+    "business_id": pa.string(),
+    "stars": pa.float64(),
+    # Cadena en la colección completa y date en la compacta: se infiere por lote
+    "date": None,
+    "useful": pa.int64(),
+    "funny": pa.int64(),
+    "cool": pa.int64(),
+}
+
+STAR_COLUMNS = [f"stars_{i}" for i in range(1, 6)]
+SUM_COLUMNS = ["useful_sum", "funny_sum", "cool_sum"]
+
+def chunk_state(chunk: pd.DataFrame) -> pd.DataFrame:
+    """
+    Estado parcial por negocio de un lote de reviews:
+      - n, mean, m2: contador, media y suma de cuadrados de desviaciones (Welford)
+      - stars_1..stars_5: histograma de estrellas
+      - first_review, last_review: primera y última fecha
+      - useful_sum, funny_sum, cool_sum: votos acumulados
+    """
+    chunk = chunk.dropna(subset=["business_id", "stars"])
+    chunk = chunk.assign(date=pd.to_datetime(chunk["date"], errors="coerce"))
+    grouped = chunk.groupby("business_id", sort=False)
+
+    state = pd.DataFrame({
+        "n": grouped["stars"].count(),
+        "mean": grouped["stars"].mean(),
+        "m2": grouped["stars"].var(ddof=0) * grouped["stars"].count(),
+        "first_review": grouped["date"].min(),
+        "last_review": grouped["date"].max(),
+        "useful_sum": grouped["useful"].sum(),
+        "funny_sum": grouped["funny"].sum(),
+        "cool_sum": grouped["cool"].sum(),
+    })
+
+    stars = chunk["stars"].round().clip(1, 5).astype(int)
+    histogram = pd.crosstab(chunk["business_id"], stars).reindex(columns=range(1, 6), fill_value=0)
+    histogram.columns = STAR_COLUMNS
+    return state.join(histogram)
+
+def merge_states(a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+    """
+    Combina dos estados parciales con la fórmula paralela de Chan et al.:
+    el resultado es el mismo que si ambos lotes se hubieran procesado juntos.
+    """
+    a, b = a.align(b, join="outer")
+    na = a["n"].fillna(0)
+    nb = b["n"].fillna(0)
+    n = na + nb
+    mean_a = a["mean"].fillna(0)
+    mean_b = b["mean"].fillna(0)
+    delta = mean_b - mean_a
+
+    merged = pd.DataFrame({
+        "n": n,
+        "mean": mean_a + delta * nb / n,
+        "m2": a["m2"].fillna(0) + b["m2"].fillna(0) + delta ** 2 * na * nb / n,
+        "first_review": pd.concat([a["first_review"], b["first_review"]], axis=1).min(axis=1),
+        "last_review": pd.concat([a["last_review"], b["last_review"]], axis=1).max(axis=1),
+    })
+    for col in SUM_COLUMNS + STAR_COLUMNS:
+        merged[col] = a[col].fillna(0) + b[col].fillna(0)
+    return merged
+
+def _range_state(collection_name, lo, hi, batch_size):
+    """
+    Recorre un rango de _id en lotes acumulando el estado parcial. La memoria
+    queda acotada por el tamaño del lote y el número de negocios.
+    """
+    cursor = get_db()[collection_name].find(
+        range_query(lo, hi), projection(REVIEW_SCHEMA), batch_size=batch_size
+    )
+    state = None
+    for batch in cursor_batches(cursor, REVIEW_SCHEMA, batch_size):
+        partial = chunk_state(batch.to_pandas())
+        state = partial if state is None else merge_states(state, partial)
+    return state
+
+def finalize(state: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convierte el estado acumulado en las columnas finales por negocio.
+    """
+    n = state["n"]
+    variance = (state["m2"] / (n - 1)).where(n > 1, 0.0)
+    stats = pd.DataFrame({
+        "business_id": state.index,
+        "stars_mean": state["mean"].to_numpy(),
+        "stars_var": variance.to_numpy(),
+        "stars_std": np.sqrt(variance).to_numpy(),
+        "first_review": state["first_review"].to_numpy(),
+        "last_review": state["last_review"].to_numpy(),
+    })
+    for col in STAR_COLUMNS + SUM_COLUMNS:
+        stats[col] = state[col].to_numpy().astype("int64")
+    return stats
+
+def compute_review_stats(workers=WORKERS, batch_size=BATCH_SIZE) -> pd.DataFrame:
+    """
+    Calcula en una sola pasada sobre las reviews, por negocio: media,
+    varianza y desviación típica de las estrellas, histograma de estrellas,
+    primera y última review y votos useful/funny/cool. Cada proceso recorre
+    un rango de _id y los estados parciales se combinan al final.
+    """
+    collection = review_collection()
+    with profile("id_ranges") as section:
+        ranges = id_ranges(collection, workers)
+        section["rows_out"] = len(ranges)
+        if ranges:
+            # Plan del primer rango, representativo del recorrido de los procesos
+            explain_stats(db, collection.name, query=range_query(*ranges[0]))
+
+    state = None
+    with profile("range_scan") as section, ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        futures = [pool.submit(_range_state, collection.name, lo, hi, batch_size) for lo, hi in ranges]
+        for future in futures:
+            partial = future.result()
+            if partial is None:
+                continue
+            state = partial if state is None else merge_states(state, partial)
+        section["rows_out"] = None if state is None else int(state["n"].sum())
+
+    if state is None:
+        return pd.DataFrame(columns=["business_id"])
+    return finalize(state)
+
+if __name__ == "__main__":
+    with profile_run("review_stats"):
+        stats = compute_review_stats()
+        with profile("write_artifact", rows_in=len(stats)):
+            write_artifact(stats, "review_stats")
+    print(f"✅ Estadísticas de {len(stats)} negocios guardadas")
@@ -0,0 +1,123 @@
+from pymongo import ASCENDING, GEOSPHERE
+
+from etl.db import get_db
+from etl.profiling import profile, profile_run
+
+db = get_db()
+
+# Índices que necesitan las consultas del ETL: (colección, claves, opciones)
+INDEXES = [
+    # $lookup de business_stats_pipeline (reviews de cada negocio con estrellas)
+    # y $match de cube_pipeline por business_id
+    ("review", [("business_id", ASCENDING), ("stars", ASCENDING)], {"name": "business_stars"}),
+    ("review_compact", [("business_id", ASCENDING), ("stars", ASCENDING)], {"name": "business_stars"}),
+    # $match inicial de business_stats_pipeline (negocios abiertos con reviews)
+    ("business", [("is_open", ASCENDING), ("review_count", ASCENDING)], {"name": "open_review_count"}),
+    # Consultas geográficas sobre el campo GeoJSON location
+    ("business", [("location", GEOSPHERE)], {"name": "location_2dsphere"}),
+    # $match de business_stats_pipeline con los negocios de una carga incremental.
+    # La carga busca por _id, que ya guarda la clave natural (business_id,
+    # review_id, user_id), así que no necesita más índices
+    ("business", [("business_id", ASCENDING)], {"name": "business_id"}),
+]
+
+# Consultas críticas que se comprueban con explain(): (nombre, colección, comando)
+HOT_QUERIES = [
+    (
+        "negocios abiertos con reviews",
+        "business",
+        {"find": "business", "filter": {"review_count": {"$gt": 0}, "is_open": 1}},
+    ),
+    (
+        "agregado de reviews por negocio",
+        "review",
+        {
+            "aggregate": "review",
+            "pipeline": [
+                {"$match": {"business_id": {"$ne": None}, "stars": {"$ne": None}}},
+                {"$group": {"_id": "$business_id", "stars_sum": {"$sum": "$stars"}, "stars_count": {"$sum": 1}}},
+            ],
+            "cursor": {},
+        },
+    ),
+    (
+        "agregado de reviews por negocio (compacta)",
+        "review_compact",
+        {
+            "aggregate": "review_compact",
+            "pipeline": [
+                {"$match": {"business_id": {"$ne": None}, "stars": {"$ne": None}}},
+                {"$group": {"_id": "$business_id", "stars_sum": {"$sum": "$stars"}, "stars_count": {"$sum": 1}}},
+            ],
+            "cursor": {},
+        },
+    ),
+]
+
+def add_business_location():
+    """
+    Añade a cada negocio un punto GeoJSON (location) a partir de longitude y
+    latitude, necesario para el índice 2dsphere. Solo toca los que no lo tienen.
+    """
+    result = db.business.update_many(
+        {
+            "location": {"$exists": False},
+            "longitude": {"$type": "number"},
+            "latitude": {"$type": "number"},
+        },
+        [{"$set": {"location": {"type": "Point", "coordinates": ["$longitude", "$latitude"]}}}],
+    )
+    if result.modified_count:
+        print(f"📍 Añadida la ubicación GeoJSON a {result.modified_count} negocios")
+
+def ensure_indexes():
+    """
+    Crea los índices declarados en INDEXES. create_index es idempotente, así
+    que se puede ejecutar tras cada carga. Las colecciones vacías se omiten.
+    """
+    existing_collections = set(db.list_collection_names())
+    for collection, keys, options in INDEXES:
+        if collection not in existing_collections or db[collection].estimated_document_count() == 0:
+            continue
+        name = db[collection].create_index(keys, **options)
+        print(f"✅ Índice '{name}' en '{collection}'")
+
+def _plan_stages(plan):
+    # Recorre el árbol del plan devolviendo el nombre de cada etapa
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _plan_stages(value)
+
+def check_queries():
+    """
+    Ejecuta explain() sobre las consultas críticas y avisa de las que recorren
+    la colección completa (COLLSCAN). Devuelve los nombres de esas consultas.
+    """
+    collscans = []
+    existing_collections = set(db.list_collection_names())
+    for name, collection, command in HOT_QUERIES:
+        if collection not in existing_collections or db[collection].estimated_document_count() == 0:
+            continue
+        explain = db.command("explain", command, verbosity="queryPlanner")
+        stages = set(_plan_stages(explain))
+        if "COLLSCAN" in stages:
+            collscans.append(name)
+            print(f"⚠️  La consulta '{name}' sobre '{collection}' hace COLLSCAN")
+        else:
+            print(f"✅ La consulta '{name}' sobre '{collection}' usa índices")
+    return collscans
+
+if __name__ == "__main__":
+    with profile_run("schema"):
+        with profile("add_business_location"):
+            add_business_location()
+        with profile("ensure_indexes"):
+            ensure_indexes()
+        with profile("check_queries"):
+            check_queries()
+    print("✅ Esquema e índices actualizados")
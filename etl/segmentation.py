@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+# Clasificación de negocios según criterios definidos
+CLASSIFICATION = {
+    "overrated": "Sobrevalorados",
+    "bad_business": "Mal negocio",
+    "best_perceived_quality": "Mejor calidad percibida (RPS)",
+    "best_rated": "Mejor valorados",
+    "worst_rated": "Peor valorados",
+    "others": "Otros",
+}
+
+# Reglas por orden de prioridad: (sector, [(columna, operador, umbral)]).
+# El umbral es el nombre de un valor de compute_thresholds o un número fijo.
+SECTOR_RULES = [
+    ("best_perceived_quality", [("review_power_score", ">=", "p90_rps"), ("stars_avg", ">=", 4.0)]),
+    ("overrated", [("review_count", "<=", "p25_reviews"), ("stars_avg", ">=", "p80_stars")]),
+    ("best_rated", [("review_count", ">=", "mean_review"), ("stars_avg", ">=", "p80_stars")]),
+    ("bad_business", [("review_count", ">=", "p95_reviews"), ("stars_avg", "<=", "p25_stars")]),
+    ("worst_rated", [("stars_avg", "<=", "p25_stars"), ("review_count", "<=", "p25_reviews")]),
+]
+
+OPERATORS = {
+    ">=": np.greater_equal,
+    "<=": np.less_equal,
+    ">": np.greater,
+    "<": np.less,
+}
+
+def compute_thresholds(df: pd.DataFrame):
+    """
+    Medias y percentiles usados para la clasificación, con una sola llamada
+    vectorizada a quantile.
+    """
+    quantiles = df[["review_count", "stars_avg", "review_power_score"]].quantile([0.25, 0.80, 0.90, 0.95])
+    mean_review = df["review_count"].mean()
+    return {
+        "mean_review": mean_review,
+        "outstanding_review": mean_review * 10,
+        "mean_rps": df["review_power_score"].mean(),
+        "p25_reviews": quantiles.at[0.25, "review_count"],
+        "p95_reviews": quantiles.at[0.95, "review_count"],
+        "p25_stars": quantiles.at[0.25, "stars_avg"],
+        "p80_stars": quantiles.at[0.80, "stars_avg"],
+        "p90_stars": quantiles.at[0.90, "stars_avg"],
+        # Se llama p90 pero es el percentil 95 del RPS
+        "p90_rps": quantiles.at[0.95, "review_power_score"],
+        "p25_rps": quantiles.at[0.25, "review_power_score"],
+    }
+
+def segment(df: pd.DataFrame, thresholds=None) -> pd.Series:
+    """
+    Evalúa SECTOR_RULES con máscaras vectorizadas. np.select se queda con la
+    primera regla que se cumple, que es el mismo orden de prioridad que la
+    antigua cadena de ifs fila a fila.
+    """
+    if thresholds is None:
+        thresholds = compute_thresholds(df)
+
+    columns = {col: df[col].to_numpy(dtype="float64") for _, conditions in SECTOR_RULES for col, _, _ in conditions}
+    masks = []
+    for _, conditions in SECTOR_RULES:
+        mask = np.ones(len(df), dtype=bool)
+        for col, op, threshold in conditions:
+            value = thresholds[threshold] if isinstance(threshold, str) else threshold
+            mask &= OPERATORS[op](columns[col], value)
+        masks.append(mask)
+
+    labels = [CLASSIFICATION[sector] for sector, _ in SECTOR_RULES]
+    sectors = np.select(masks, labels, default=CLASSIFICATION["others"])
+    return pd.Series(sectors, index=df.index, name="sector")
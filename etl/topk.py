@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from etl.artifacts import artifact_path, read_artifact, write_artifact
+from etl.categories import split_categories
+from etl.profiling import profile, profile_run
+
+TOP_K = int(os.environ.get("TOP_K", 100))
+
+# Claves de cada lista: estado, ciudad y categoría ("" si no aplica)
+KEY_COLUMNS = ["state", "city", "category"]
+
+def _top_per_group(ranked: pd.DataFrame, keys, scope, k):
+    """
+    ranked está ordenado por RPS descendente, así que head(k) por grupo
+    devuelve directamente el top k de cada grupo ya ordenado.
+    """
+    top = ranked.groupby(keys, observed=True, sort=False).head(k).copy()
+    top["rank"] = top.groupby(keys, observed=True, sort=False).cumcount() + 1
+    for col in KEY_COLUMNS:
+        if col not in keys:
+            top[col] = ""
+    top["scope"] = scope
+    return top[["scope"] + KEY_COLUMNS + ["rank", "row", "business_id", "review_power_score"]]
+
+def build_topk(df: pd.DataFrame, k=TOP_K) -> pd.DataFrame:
+    """
+    Materializa las listas top k por RPS de todo el dataset, de cada estado,
+    cada (estado, ciudad), cada categoría y cada (estado, categoría). La
+    columna row es la posición del negocio en business_clustered.
+    """
+    base = pd.DataFrame({
+        "row": np.arange(len(df), dtype="int64"),
+        "business_id": df["business_id"].to_numpy(),
+        "state": df["state"].astype(str).to_numpy(),
+        "city": df["city"].astype(str).to_numpy(),
+        "review_power_score": df["review_power_score"].to_numpy(dtype="float64"),
+    })
+    ranked = base.sort_values("review_power_score", ascending=False, kind="stable")
+
+    exploded = split_categories(df["categories"])
+    by_category = base.iloc[exploded.index.to_numpy()].assign(category=exploded.to_numpy())
+    ranked_categories = by_category.sort_values("review_power_score", ascending=False, kind="stable")
+
+    glob = ranked.head(k).assign(state="", city="", category="", scope="global")
+    glob["rank"] = np.arange(1, len(glob) + 1)
+
+    return pd.concat([
+        glob[["scope"] + KEY_COLUMNS + ["rank", "row", "business_id", "review_power_score"]],
+        _top_per_group(ranked, ["state"], "state", k),
+        _top_per_group(ranked, ["state", "city"], "city", k),
+        _top_per_group(ranked_categories, ["category"], "category", k),
+        _top_per_group(ranked_categories, ["state", "category"], "state_category", k),
+    ], ignore_index=True)
+
+def topk_lookup(topk: pd.DataFrame):
+    """
+    Diccionario (estado, ciudad, categoría) -> posiciones de fila en orden de
+    RPS, usando "Todos"/"Todas" para los filtros no aplicados como en el
+    dashboard.
+    """
+    keys = topk[KEY_COLUMNS].astype(str).replace({"state": {"": "Todos"}, "city": {"": "Todas"}, "category": {"": "Todas"}})
+    topk = topk.assign(**{col: keys[col] for col in KEY_COLUMNS}).sort_values(["scope", "rank"])
+    return {
+        key: group["row"].to_numpy()
+        for key, group in topk.groupby(KEY_COLUMNS, sort=False)
+    }
+
+if __name__ == "__main__":
+    with profile_run("topk"):
+        df = read_artifact("business_clustered", ["business_id", "state", "city", "categories", "review_power_score"])
+        with profile("build_topk", rows_in=len(df)) as section:
+            topk = build_topk(df)
+            section["rows_out"] = len(topk)
+        with profile("write_artifact", rows_in=len(topk)):
+            write_artifact(topk, "topk_rps")
+    print(f"✅ Listas top {TOP_K} por RPS guardadas en {artifact_path('topk_rps')} ({len(topk)} filas)")
@@ -8,41 +8,11 @@ echo ""
 echo "🚀 Iniciando la aplicación de análisis de datos..."
 echo ""
 
-# Comprobación de existencia del fichero data/business_clustered.csv
-if [ -f "data/business_clustered.csv" ]; then
-  echo "✅ El fichero data/business_clustered.csv existe."
-else
-  echo "❌ El fichero data/business_clustered.csv NO existe."
-  echo "🔄 Iniciando el proceso ETL y análisis de datos..."
-  echo ""
-
-  # Esperar a que MongoDB esté disponible
-  echo "⏳ Esperando a MongoDB..."
-  until python -c "from pymongo import MongoClient; MongoClient('mongo', 27017).admin.command('ping')" >/dev/null 2>&1; do
-    sleep 2
-  done
-
-  echo "✅ MongoDB disponible"
-  echo ""
-
-  # Carga de datos inicial
-  echo "📥 Cargando datos en MongoDB..."
-  python -u etl/load_data.py
-  echo ""
-
-  # Pipeline de procesamiento de datos
-  echo "🧹 Limpieza de datos..."
-  python -u etl/clean_data.py
-  echo ""
-
-  echo "🧠 Generando features..."
-  python -u etl/features.py
-  echo ""
-
-  echo "🤖 Ejecutando clustering..."
-  python analysis/clustering.py
-  echo ""
-fi
+# Pipeline ETL y de análisis (etl/pipeline.py): cada etapa se ejecuta solo si
+# ha cambiado su código, sus parámetros o sus datos de entrada
+echo "🔄 Comprobando el pipeline ETL y de análisis..."
+echo ""
+python -u -m etl.pipeline
 echo ""
 
 
@@ -0,0 +1,17 @@
+import pytest
+
+from etl.clean_data import normalize_city
+
+@pytest.mark.parametrize("raw, expected", [
+    ("  las vegas ", "Las Vegas"),
+    ("PHILADELPHIA,", "Philadelphia"),
+    # Letras no ASCII: las variantes de mayúsculas se agrupan en la misma ciudad
+    ("MONTRÉAL", "Montréal"),
+    ("montréal", "Montréal"),
+    ("winston-salem", "Winston-Salem"),
+    ("st. louis", "St. Louis"),
+    (None, ""),
+    (12, ""),
+])
+def test_normalize_city(raw, expected):
+    assert normalize_city(raw) == expected
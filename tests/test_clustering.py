@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import etl.artifacts
+from analysis.clustering import DRIFT_THRESHOLD, centroid_drift, train
+from etl.artifacts import write_artifact
+
+def business_frame(seed, n=5000, shift=0.0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "stars": np.clip(rng.normal(3.7 + shift, 0.8, n), 1, 5),
+        "review_count": rng.lognormal(3.5 + shift, 1.0, n).round() + 5,
+    })
+
+@pytest.fixture
+def artifacts(tmp_path, monkeypatch):
+    monkeypatch.setattr(etl.artifacts, "ARTIFACTS_PATH", str(tmp_path))
+    return tmp_path
+
+def test_same_data_does_not_retrain(artifacts):
+    write_artifact(business_frame(0), "featured_business")
+    model = train(epochs=2)
+    drift = centroid_drift(model)
+    assert drift == pytest.approx(0.0, abs=1e-6)
+    assert drift <= DRIFT_THRESHOLD
+
+def test_shifted_data_retrains(artifacts):
+    write_artifact(business_frame(0), "featured_business")
+    model = train(epochs=2)
+    write_artifact(business_frame(1, shift=1.0), "featured_business")
+    assert centroid_drift(model) > DRIFT_THRESHOLD
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from etl.features import DEFAULT_PRIOR_MEAN, build_features, credibility_scale, rating_prior
+
+def business_frame(n=50, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "business_id": [f"b{i}" for i in range(n)],
+        "stars": rng.integers(2, 11, n) / 2,
+        "stars_avg": rng.uniform(1, 5, n),
+        "review_count": rng.integers(5, 500, n).astype("float64"),
+    })
+
+def test_empty_previous_computes_everything():
+    df, _ = build_features(business_frame())
+    expected = df.copy()
+    previous = df.iloc[:0]
+    df, manifest = build_features(business_frame(), previous, manifest={"features": {}})
+    assert manifest["features"]["review_power_score"]["rows"] == len(df)
+    pd.testing.assert_frame_equal(df, expected)
+
+def test_reuse_matches_full_computation():
+    first, manifest = build_features(business_frame())
+    changed = business_frame()
+    changed.loc[3, "review_count"] += 10
+    df, new_manifest = build_features(changed.copy(), first, manifest)
+    expected, _ = build_features(changed.copy())
+    assert new_manifest["features"]["log_volume"]["rows"] == 1
+    pd.testing.assert_frame_equal(df, expected)
+
+def test_prior_without_ratings():
+    stars_avg = np.full(4, np.nan)
+    assert rating_prior(stars_avg, np.ones(4)) == {"prior_mean": DEFAULT_PRIOR_MEAN}
+    assert rating_prior(np.array([4.0, 5.0]), np.zeros(2)) == {"prior_mean": DEFAULT_PRIOR_MEAN}
+
+def test_credibility_scale_without_weights():
+    params = credibility_scale(np.full(3, 4.0), np.zeros(3), np.full(3, 10.0))
+    assert params == {"mean_weight": 1.0}
+    params = credibility_scale(np.full(3, np.nan), np.full(3, np.nan), np.full(3, 10.0))
+    assert params == {"mean_weight": 1.0}
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from etl.neighbors import EARTH_RADIUS_KM, competitor_column, neighbor_features, primary_category
+
+CATEGORIES = ["Pizza", "Italian", "Sushi Bars", "Restaurants", "Bars", "Coffee & Tea"]
+
+def business_frame(seed, n=400):
+    rng = np.random.default_rng(seed)
+    categories = [
+        ", ".join(rng.choice(CATEGORIES, size=rng.integers(0, 3), replace=False)) for _ in range(n)
+    ]
+    latitude = 40 + rng.normal(0, 0.03, n)
+    longitude = -75 + rng.normal(0, 0.03, n)
+    # Coordenadas repetidas y negocios sin coordenadas
+    latitude[:5], longitude[:5] = latitude[5], longitude[5]
+    latitude[-3:] = np.nan
+    return pd.DataFrame({
+        "categories": categories,
+        "latitude": latitude,
+        "longitude": longitude,
+        "review_power_score": rng.integers(0, 20, n).astype("float64"),
+    })
+
+def haversine_km(lat, lon):
+    lat, lon = np.radians(lat), np.radians(lon)
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:, None]) * np.cos(lat[None, :]) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+def reference(df, radii, peers_k, peer_radius):
+    # Todos los pares: competidores son los que comparten cualquier categoría
+    sets = [set(c for c in cats.split(", ") if c) for cats in df["categories"]]
+    valid = np.array([bool(s) for s in sets]) & df["latitude"].notna().to_numpy()
+    distance = haversine_km(df["latitude"].to_numpy(), df["longitude"].to_numpy())
+    rps = df["review_power_score"].to_numpy()
+    counts = {r: np.zeros(len(df), dtype=int) for r in radii}
+    percentile = np.full(len(df), np.nan)
+    for i in np.flatnonzero(valid):
+        others = [j for j in np.flatnonzero(valid) if j != i and sets[i] & sets[j]]
+        others = sorted(others, key=lambda j: distance[i, j])
+        for r in radii:
+            counts[r][i] = sum(distance[i, j] <= r for j in others)
+        peers = [j for j in others if distance[i, j] <= peer_radius][:peers_k]
+        if peers:
+            below = sum(rps[j] < rps[i] for j in peers) + 0.5 * sum(rps[j] == rps[i] for j in peers)
+            percentile[i] = 100 * below / len(peers)
+    return counts, percentile
+
+@pytest.mark.parametrize("seed", range(3))
+def test_competitors_share_any_category(seed):
+    df = business_frame(seed)
+    radii, peers_k, peer_radius = [1.0, 3.0], 8, 2.0
+    features = neighbor_features(df, radii=radii, peers_k=peers_k, peer_radius=peer_radius, batch=97)["business_neighbors"]
+    counts, percentile = reference(df, radii, peers_k, peer_radius)
+    for r in radii:
+        np.testing.assert_array_equal(features[competitor_column(r)].to_numpy(), counts[r])
+    np.testing.assert_allclose(features["rps_peer_percentile"].to_numpy(), percentile)
+
+def test_pizza_and_italian_compete_through_shared_category():
+    df = pd.DataFrame({
+        "categories": ["Pizza, Restaurants", "Italian, Restaurants", "Coffee & Tea"],
+        "latitude": [40.0, 40.001, 40.0005],
+        "longitude": [-75.0, -75.0, -75.0],
+        "review_power_score": [10.0, 12.0, 5.0],
+    })
+    features = neighbor_features(df, radii=[1.0])["business_neighbors"]
+    assert features[competitor_column(1.0)].tolist() == [1, 1, 0]
+
+def test_similar_uses_primary_category():
+    df = business_frame(0)
+    similar = neighbor_features(df, similar_k=4)["business_similar"]
+    codes, _ = primary_category(df["categories"])
+    pairs = similar[similar["neighbor"] >= 0]
+    assert (pairs["neighbor"] != pairs["row"]).all()
+    assert (codes[pairs["row"]] == codes[pairs["neighbor"]]).all()
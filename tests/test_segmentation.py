@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from etl.segmentation import CLASSIFICATION, compute_thresholds, segment
+
+def classify(row, thresholds):
+    # Clasificación fila a fila original (dashboard/app.py), usada como referencia
+    if row["review_power_score"] >= thresholds["p90_rps"] and row["stars_avg"] >= 4.0:
+        return CLASSIFICATION["best_perceived_quality"]
+    if row["review_count"] <= thresholds["p25_reviews"] and row["stars_avg"] >= thresholds["p80_stars"]:
+        return CLASSIFICATION["overrated"]
+    if row["review_count"] >= thresholds["mean_review"] and row["stars_avg"] >= thresholds["p80_stars"]:
+        return CLASSIFICATION["best_rated"]
+    if row["review_count"] >= thresholds["p95_reviews"] and row["stars_avg"] <= thresholds["p25_stars"]:
+        return CLASSIFICATION["bad_business"]
+    if row["stars_avg"] <= thresholds["p25_stars"] and row["review_count"] <= thresholds["p25_reviews"]:
+        return CLASSIFICATION["worst_rated"]
+    return CLASSIFICATION["others"]
+
+def reference(df, thresholds):
+    if df.empty:
+        return pd.Series([], index=df.index, dtype=object, name="sector")
+    return df.apply(classify, axis=1, thresholds=thresholds).rename("sector")
+
+def random_frame(seed, n, nan_share=0.0):
+    """
+    Negocios aleatorios con valores discretos (medias estrellas, reviews
+    enteras), así que muchas filas caen justo en los percentiles.
+    """
+    rng = np.random.default_rng(seed)
+    stars_avg = rng.integers(2, 11, n) / 2
+    review_count = rng.integers(5, 200, n).astype("float64")
+    stars_avg[rng.random(n) < nan_share] = np.nan
+    df = pd.DataFrame({"stars_avg": stars_avg, "review_count": review_count})
+    df["review_power_score"] = np.round(df["stars_avg"] * np.log1p(df["review_count"]), 1)
+    return df
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("nan_share", [0.0, 0.1])
+def test_segment_matches_row_classify(seed, nan_share):
+    df = random_frame(seed, 2000, nan_share)
+    thresholds = compute_thresholds(df)
+    pd.testing.assert_series_equal(segment(df, thresholds), reference(df, thresholds), check_dtype=False)
+
+def test_segment_at_exact_thresholds():
+    df = random_frame(42, 500)
+    thresholds = compute_thresholds(df)
+    # Filas exactamente en cada umbral (los operadores son >= y <=)
+    edges = pd.DataFrame({
+        "stars_avg": [4.0, thresholds["p80_stars"], thresholds["p25_stars"], thresholds["p80_stars"], thresholds["p25_stars"]],
+        "review_count": [10.0, thresholds["p25_reviews"], thresholds["p95_reviews"], thresholds["mean_review"], thresholds["p25_reviews"]],
+        "review_power_score": [thresholds["p90_rps"], 0.0, 0.0, 0.0, 0.0],
+    })
+    pd.testing.assert_series_equal(segment(edges, thresholds), reference(edges, thresholds), check_dtype=False)
+    assert segment(edges, thresholds).iloc[0] == CLASSIFICATION["best_perceived_quality"]
+
+def test_segment_default_thresholds():
+    df = random_frame(7, 300, 0.05)
+    pd.testing.assert_series_equal(segment(df), reference(df, compute_thresholds(df)), check_dtype=False)
+
+def test_segment_empty():
+    df = random_frame(0, 0)
+    result = segment(df, compute_thresholds(df))
+    assert result.empty
+    pd.testing.assert_series_equal(result, reference(df, compute_thresholds(df)), check_dtype=False)